@@ -1,18 +1,27 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sqlite3
 import argparse
 import logging
 from datetime import datetime
+import shutil
+import stat
 from shutil import copy2
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, TextIO, Iterator
 from pathlib import Path
 from contextlib import contextmanager
 import sys
 import csv
-import tempfile
-import configparser
+import gzip
+import threading
+import functools
+from operator import itemgetter
+import heapq
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import unicodedata
 
 # Configure logging
 logging.basicConfig(
@@ -21,24 +30,181 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Key under which a trie node stores its (old_prefix_length, new_prefix) terminal
+_TRIE_TERMINAL = ""
+# Up to this many mappings are matched with one compiled regex instead of the trie;
+# the regex tries each alternative in turn, so past a few prefixes the trie is cheaper
+_REGEX_MAX_MAPPINGS = 4
+# Worker threads used to overlap blocking stat calls on slow or network storage
+DEFAULT_STAT_WORKERS = 32
+# Paths handed to one get_file_info_batch call; each touches at most two
+# directories, so a batch's listings fit in the directory cache
+_PROBE_BATCH_SIZE = 1000
+# Directory listings kept by PlexPathMapper; covers the directories of a full probe batch
+_DIR_CACHE_SIZE = 4096
+# get_file_info results kept by PlexPathMapper, oldest dropped first
+_STAT_CACHE_SIZE = 65536
+# Rows collected before each csv.writer.writerows call during export
+_CSV_WRITE_BUFFER_ROWS = 8192
+# Column layout of the results table, bound once instead of parsed per row
+_ROW_FMT = "{:<30} {:<3} {:<20} {:<6} {:<8} {:<25}".format
+
+
+def valid_timestamp_range() -> Tuple[int, int]:
+    """
+    Get the range of Unix timestamps accepted as real file times.
+    
+    Returns:
+        Tuple of (min_ts, max_ts); valid timestamps satisfy min_ts <= ts < max_ts,
+        i.e. no earlier than 1970 and no later than the end of next year
+    """
+    return 0, int(datetime(datetime.now().year + 2, 1, 1).timestamp())
+
+
+@contextmanager
+def stat_executor(workers: int) -> Iterator[Optional[ThreadPoolExecutor]]:
+    """
+    Provide a thread pool for file probes.
+    
+    Args:
+        workers: Number of worker threads; 1 or less probes serially
+        
+    Yields:
+        ThreadPoolExecutor, or None when probing serially
+    """
+    if workers <= 1:
+        yield None
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield executor
+
+
+def open_read_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Open a connection tuned for bulk reads of the Plex database.
+    
+    The file is opened read-only through a URI, so SQLite never takes the
+    write path for it. The connection runs in autocommit mode and uses a
+    large page cache, memory-mapped I/O and in-memory temp storage for the
+    sorts and joins of the export queries.
+    
+    Args:
+        db_path: Path to the database file
+        
+    Returns:
+        Open sqlite3 connection
+    """
+    # Not immutable=1: Plex may be writing the database while we read it
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA cache_size = -200000")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def quote_dot_command_arg(value: str) -> str:
+    """
+    Quote an argument for an sqlite3 shell dot-command such as .backup.
+    
+    Single-quoted arguments cannot contain a quote at all, so the value is
+    double-quoted with backslash escapes, which the shell resolves.
+    
+    Args:
+        value: Raw argument, e.g. a file path
+        
+    Returns:
+        The quoted argument
+    """
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+_RECENT_MEDIA_SQL = """
+    SELECT 
+        metadata_items.id,
+        metadata_items.title, 
+        metadata_items.added_at,
+        metadata_items.created_at,
+        metadata_items.updated_at,
+        metadata_items.library_section_id,
+        media_parts.file as file_path
+    FROM metadata_items
+    JOIN media_items ON metadata_items.id = media_items.metadata_item_id
+    JOIN media_parts ON media_items.id = media_parts.media_item_id
+    WHERE metadata_items.title IS NOT NULL
+    AND media_parts.file IS NOT NULL 
+    AND LENGTH(media_parts.file) > 0
+"""
+# Sort keys SQLite can order and limit itself
+_SQL_SORT_COLUMNS = ('added_at', 'created_at', 'updated_at')
+# get_recent_media queries, fixed strings so the connection's statement cache
+# reuses their prepared plans; file_mtime is sorted in Python after probing
+_SELECT_SQL = {
+    # updated_at breaks ties, so items without the sort key keep the old fallback order
+    **{column: _RECENT_MEDIA_SQL
+       + f" ORDER BY metadata_items.{column} DESC, metadata_items.updated_at DESC LIMIT ?"
+       for column in _SQL_SORT_COLUMNS},
+    'file_mtime': _RECENT_MEDIA_SQL + " ORDER BY metadata_items.updated_at DESC",
+}
+
+
+def _fold_name(name: str) -> str:
+    """Fold a file name the way case- and normalization-insensitive filesystems compare it."""
+    return unicodedata.normalize('NFC', name).casefold()
+
+
+class _DirListing(dict):
+    """Regular files of one directory by exact name, plus the set of their folded names."""
+    
+    __slots__ = ('folded',)
+    
+    def __init__(self, entries: Optional[Dict[str, os.DirEntry]] = None):
+        super().__init__(entries or ())
+        self.folded = frozenset(map(_fold_name, self))
+
+
+# Cached in place of a listing for directories that exist but cannot be read
+_UNLISTABLE_DIR = _DirListing()
+
 
 class PlexPathMapper:
     """Handle path mapping operations for Plex database paths."""
     
-    def __init__(self, path_mappings: Optional[List[Tuple[str, str]]] = None, config_path: str = "path_mappings.conf"):
+    # map_path and the probes run once or more per row; slots keep their
+    # attribute lookups off a per-instance __dict__
+    __slots__ = (
+        'prefer_mapped', 'path_mappings', '_dir_cache', '_stat_cache', '_cache_lock',
+        '_trie', '_prefix_targets', '_prefix_regex', '_max_prefix_len',
+        '_match_dir_prefix', '_last_dir',
+    )
+    
+    def __init__(self, path_mappings: Optional[List[Tuple[str, str]]] = None, config_path: str = "path_mappings.conf",
+                 prefer_mapped: bool = False):
         """
         Initialize the path mapper.
         
         Args:
             path_mappings: List of (old_prefix, new_prefix) tuples
             config_path: Path to config file for path mappings
+            prefer_mapped: Probe the mapped path before the original one for
+                paths covered by a mapping (saves a lookup per file when the
+                original locations no longer exist)
         """
+        self.prefer_mapped = prefer_mapped
         if path_mappings is not None:
             self.path_mappings = path_mappings
         else:
             self.path_mappings = self._load_mappings_from_file(config_path)
             if not self.path_mappings:
                 raise ValueError("No path mappings found in config file and none provided")
+        
+        # Directory listings keyed by directory path, filled on first probe
+        self._dir_cache: 'OrderedDict[str, _DirListing]' = OrderedDict()
+        # get_file_info results keyed by Plex path, so repeat lookups skip the probe
+        self._stat_cache: 'OrderedDict[str, Tuple[Optional[datetime], Optional[str], bool]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._build_prefix_index()
     
     def _load_mappings_from_file(self, config_path: str) -> List[Tuple[str, str]]:
         mappings = []
@@ -53,6 +219,60 @@ class PlexPathMapper:
                         mappings.append( (parts[0].strip(), parts[1].strip()) )
         return mappings
     
+    def _build_prefix_index(self) -> None:
+        """
+        Compile path mappings into a prefix matcher.
+        
+        Longer prefixes win over shorter ones; for duplicate prefixes the
+        first mapping listed wins. A handful of mappings is matched with a
+        single compiled regex, larger tables with a character trie so the
+        lookup cost does not grow with the number of mappings.
+        """
+        self._trie: Dict[str, Any] = {}
+        self._prefix_targets: Dict[str, str] = {}
+        
+        for old_prefix, new_prefix in sorted(self.path_mappings, key=lambda m: len(m[0]), reverse=True):
+            self._prefix_targets.setdefault(old_prefix, new_prefix)
+            node = self._trie
+            for char in old_prefix:
+                node = node.setdefault(char, {})
+            node.setdefault(_TRIE_TERMINAL, (len(old_prefix), new_prefix))
+        
+        if len(self._prefix_targets) <= _REGEX_MAX_MAPPINGS:
+            self._prefix_regex = re.compile(
+                "|".join(re.escape(prefix) for prefix in self._prefix_targets)
+            ) if self._prefix_targets else None
+        else:
+            self._prefix_regex = None
+        
+        # Paths in one directory share a mapping, so lookups are memoized per
+        # directory. This is only exact when no prefix reaches past the last
+        # '/', which map_path checks against the longest prefix.
+        self._max_prefix_len = max((len(prefix) for prefix in self._prefix_targets), default=0)
+        self._match_dir_prefix = functools.lru_cache(maxsize=16384)(self._match_prefix)
+        # One-slot (directory, mapping) cache in front of the LRU: consecutive
+        # rows usually share a directory. Stored as one tuple so threads never
+        # see a directory paired with another directory's mapping.
+        self._last_dir: Optional[Tuple[str, Optional[Tuple[int, str]]]] = None
+    
+    def _match_prefix(self, plex_path: str) -> Optional[Tuple[int, str]]:
+        """Return (old_prefix_length, new_prefix) of the longest matching mapping."""
+        if self._prefix_regex is not None:
+            match = self._prefix_regex.match(plex_path)
+            if match is None:
+                return None
+            old_prefix = match.group()
+            return len(old_prefix), self._prefix_targets[old_prefix]
+        
+        node = self._trie
+        best = node.get(_TRIE_TERMINAL)
+        for char in plex_path:
+            node = node.get(char)
+            if node is None:
+                break
+            best = node.get(_TRIE_TERMINAL, best)
+        return best
+    
     def map_path(self, plex_path: str) -> str:
         """
         Map Plex database paths to actual filesystem paths.
@@ -68,18 +288,115 @@ class PlexPathMapper:
         
         # Clean the path
         plex_path = plex_path.strip()
+        if not self._prefix_targets:
+            return plex_path
         
-        # Apply path mappings
-        for old_prefix, new_prefix in self.path_mappings:
-            if plex_path.startswith(old_prefix):
-                return plex_path.replace(old_prefix, new_prefix, 1)
+        # Apply the longest matching path mapping
+        match = self._find_mapping(plex_path)
+        if match is None:
+            return plex_path
         
-        return plex_path
+        old_len, new_prefix = match
+        return new_prefix + plex_path[old_len:]
+    
+    def _find_mapping(self, plex_path: str) -> Optional[Tuple[int, str]]:
+        """Look up the mapping for a cleaned path, memoized per directory where exact."""
+        dir_len = plex_path.rfind('/') + 1
+        if dir_len >= self._max_prefix_len:
+            dirname = plex_path[:dir_len]
+            last = self._last_dir
+            if last is not None and last[0] == dirname:
+                return last[1]
+            match = self._match_dir_prefix(dirname)
+            self._last_dir = (dirname, match)
+            return match
+        return self._match_prefix(plex_path)
+    
+    def has_mapping(self, plex_path: str) -> bool:
+        """Check whether any path mapping applies to plex_path."""
+        return bool(plex_path) and self._find_mapping(plex_path.strip()) is not None
+    
+    def clear_cache(self) -> None:
+        """Forget cached directory listings and file info so later probes see filesystem changes."""
+        with self._cache_lock:
+            self._dir_cache.clear()
+            self._stat_cache.clear()
+    
+    def _list_dir(self, dirname: str) -> _DirListing:
+        """Read the regular files of a directory into the cache and return them."""
+        try:
+            with os.scandir(dirname or ".") as it:
+                entries = _DirListing({entry.name: entry for entry in it if entry.is_file()})
+        except (FileNotFoundError, NotADirectoryError):
+            entries = _DirListing()
+        except OSError:
+            # e.g. search-only permission: files may still be stat-able by name
+            entries = _UNLISTABLE_DIR
+        with self._cache_lock:
+            entries = self._dir_cache.setdefault(dirname, entries)
+            if len(self._dir_cache) > _DIR_CACHE_SIZE:
+                self._dir_cache.popitem(last=False)
+            return entries
+    
+    def _stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        Stat a regular file using a cached listing of its parent directory.
+        
+        The first probe in a directory reads the whole listing with one
+        os.scandir call; later probes in the same directory are answered
+        from memory, and missing files cost no syscall at all. The least
+        recently used listings are dropped once _DIR_CACHE_SIZE directories
+        are cached. Directories that exist but cannot be listed fall back to
+        one os.stat per file, as do names that only match a listed name
+        after case and Unicode folding: case-insensitive filesystems (macOS,
+        SMB, Windows) resolve those, case-sensitive ones do not. Safe to
+        call from several threads; directories are listed outside the lock.
+        
+        Args:
+            path: Filesystem path to look up
+            
+        Returns:
+            The stat result, or None if the path is not a regular file
+        """
+        dirname, basename = os.path.split(path)
+        with self._cache_lock:
+            entries = self._dir_cache.get(dirname)
+            if entries is not None:
+                self._dir_cache.move_to_end(dirname)
+        if entries is None:
+            entries = self._list_dir(dirname)
+        if entries is _UNLISTABLE_DIR:
+            return self._stat_unlisted(path)
+        
+        entry = entries.get(basename)
+        if entry is None:
+            if _fold_name(basename) in entries.folded:
+                return self._stat_unlisted(path)
+            return None
+        return entry.stat()
+    
+    @staticmethod
+    def _stat_unlisted(path: str) -> Optional[os.stat_result]:
+        """Stat a file the directory listing cannot answer for with one os.stat call."""
+        try:
+            file_stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return file_stat if stat.S_ISREG(file_stat.st_mode) else None
+    
+    def file_exists(self, path: str) -> bool:
+        """Check whether path is an existing regular file."""
+        try:
+            return self._stat(path) is not None
+        except OSError:
+            return False
     
     def get_file_info(self, plex_path: str) -> Tuple[Optional[datetime], Optional[str], bool]:
         """
         Get file modification time, trying path mapping if original path fails.
         
+        Results are cached per path until clear_cache() is called.
+        
         Args:
             plex_path: Original path from Plex database
             
@@ -89,35 +406,156 @@ class PlexPathMapper:
         if not plex_path:
             return None, None, False
         
-        # Try original path first
-        original_path = Path(plex_path)
-        if original_path.is_file():
-            try:
-                mtime = datetime.fromtimestamp(original_path.stat().st_mtime)
-                return mtime, str(original_path), True
-            except (OSError, ValueError) as e:
-                logger.warning(f"Error reading mtime for {plex_path}: {e}")
-        
-        # Try mapped path
+        info = self._stat_cache.get(plex_path)
+        if info is None:
+            info = self._lookup_file_info(plex_path)
+            with self._cache_lock:
+                self._stat_cache[plex_path] = info
+                if len(self._stat_cache) > _STAT_CACHE_SIZE:
+                    self._stat_cache.popitem(last=False)
+        return info
+    
+    def _lookup_file_info(self, plex_path: str) -> Tuple[Optional[datetime], Optional[str], bool]:
+        """Probe the original and mapped locations of plex_path, bypassing the cache."""
+        for path in self._candidate_paths(plex_path):
+            mtime = self._probe(path)
+            if mtime is not None:
+                return mtime, path, True
+        return None, None, False
+    
+    def _candidate_paths(self, plex_path: str) -> Tuple[str, ...]:
+        """Return the locations to probe for plex_path, in probing order."""
         mapped_path = self.map_path(plex_path)
-        if mapped_path != plex_path:
-            mapped_path_obj = Path(mapped_path)
-            if mapped_path_obj.is_file():
-                try:
-                    mtime = datetime.fromtimestamp(mapped_path_obj.stat().st_mtime)
-                    return mtime, mapped_path, True
-                except (OSError, ValueError) as e:
-                    logger.warning(f"Error reading mtime for mapped path {mapped_path}: {e}")
+        if mapped_path == plex_path:
+            return (plex_path,)
+        # Try original path first, unless configured to trust the mapping
+        if self.prefer_mapped and self.has_mapping(plex_path):
+            return (mapped_path, plex_path)
+        return (plex_path, mapped_path)
+    
+    def _listed_missing(self, path: str) -> bool:
+        """Tell whether a cached directory listing shows path does not exist."""
+        dirname, basename = os.path.split(path)
+        with self._cache_lock:
+            entries = self._dir_cache.get(dirname)
+        return (entries is not None and entries is not _UNLISTABLE_DIR
+                and basename not in entries and _fold_name(basename) not in entries.folded)
+    
+    def _probe(self, path: str) -> Optional[datetime]:
+        """Return the modification time of a regular file, or None."""
+        try:
+            file_stat = self._stat(path)
+            if file_stat is not None:
+                return datetime.fromtimestamp(file_stat.st_mtime)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error reading mtime for {path}: {e}")
+        return None
+    
+    def get_file_info_batch(self, plex_paths: List[str],
+                            executor: Optional[ThreadPoolExecutor] = None
+                            ) -> List[Tuple[Optional[datetime], Optional[str], bool]]:
+        """
+        Get file info for many paths, listing each directory they touch once.
         
-        return None, None, False
+        The directories of the locations probed first (the original path,
+        or the mapped one with prefer_mapped) are read up front. Fallback
+        directories are only read for paths the first listing shows to be
+        missing. Concurrent probes therefore never list the same directory
+        twice, and the per-path lookups that follow are answered from the
+        cache.
+        
+        Args:
+            plex_paths: Original paths from Plex database
+            executor: Optional thread pool to spread the work over
+            
+        Returns:
+            List of (datetime_mtime, actual_path_used, exists) in input order
+        """
+        map_fn = executor.map if executor is not None else map
+        
+        candidates = [
+            self._candidate_paths(plex_path) for plex_path in plex_paths
+            if plex_path and plex_path not in self._stat_cache
+        ]
+        self._prefetch_dirs({paths[0] for paths in candidates}, map_fn)
+        self._prefetch_dirs(
+            {paths[1] for paths in candidates if len(paths) > 1 and self._listed_missing(paths[0])},
+            map_fn
+        )
+        
+        return list(map_fn(self.get_file_info, plex_paths))
+    
+    def _prefetch_dirs(self, paths: set, map_fn) -> None:
+        """List the parent directories of paths that are not cached yet."""
+        dirnames = {os.path.dirname(path) for path in paths}
+        pending = [dirname for dirname in dirnames if dirname not in self._dir_cache]
+        for _ in map_fn(self._list_dir, pending):
+            pass
 
 
 class CSVHandler:
     """Handle CSV export and import operations."""
     
+    @staticmethod
+    def open_csv(csv_path: str, mode: str) -> TextIO:
+        """
+        Open a CSV file for reading or writing text.
+        
+        Paths ending in .gz are transparently gzip-compressed. The fastest
+        compression level is used since CSV text shrinks well even at level 1
+        and the export should stay bound by the database, not the compressor.
+        
+        Args:
+            csv_path: Path to CSV file
+            mode: 'r' or 'w'
+            
+        Returns:
+            Text file object suitable for the csv module
+        """
+        if csv_path.endswith('.gz'):
+            return gzip.open(csv_path, mode + 't', compresslevel=1, encoding='utf-8', newline='')
+        return open(csv_path, mode, encoding='utf-8', newline='', buffering=1 << 20)
+    
+    @staticmethod
+    def _read_columns(csvfile: TextIO, columns: List[Tuple[str, Any]]) -> Iterator[Tuple]:
+        """
+        Read selected columns from CSV rows as tuples.
+        
+        Column positions are resolved once from the header and each row is
+        picked apart with a single itemgetter call; blank lines are skipped.
+        Like csv.DictReader, short rows read their missing fields as None
+        and extra trailing fields are ignored.
+        
+        Args:
+            csvfile: Open CSV file positioned at the header row
+            columns: (name, default) pairs, at least two; missing columns read as default
+            
+        Returns:
+            Iterator of tuples with values in the order of columns
+        """
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        
+        positions = {name: i for i, name in enumerate(header)}
+        pad = []
+        for name, default in columns:
+            if name not in positions:
+                positions[name] = len(header) + len(pad)
+                pad.append(default)
+        
+        # Fit ragged rows to the header so the padded columns stay in place
+        width = len(header)
+        filler = [None] * width
+        rows = (
+            (row if len(row) == width else (row + filler)[:width]) + pad
+            for row in reader if row
+        )
+        return map(itemgetter(*(positions[name] for name, _ in columns)), rows)
+    
     @staticmethod
     def export_full_media_data_to_csv(db_path: str, csv_path: str, path_mapper: PlexPathMapper,
-                                     limit: Optional[int] = None) -> bool:
+                                     limit: Optional[int] = None,
+                                     stat_workers: int = DEFAULT_STAT_WORKERS) -> bool:
         """
         Export complete media data with file modification times to CSV.
         This exports ALL data needed to recreate entries with updated timestamps.
@@ -127,12 +565,13 @@ class CSVHandler:
             csv_path: Path to output CSV file
             path_mapper: PlexPathMapper instance for path resolution
             limit: Optional limit on number of records
+            stat_workers: Threads used to probe files; 1 probes serially
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            conn = sqlite3.connect(db_path)
+            conn = open_read_connection(db_path)
             cursor = conn.cursor()
             
             # Query to get all necessary data
@@ -191,49 +630,36 @@ class CSVHandler:
             if limit:
                 query += f" LIMIT {limit}"
             
+            cursor.arraysize = _PROBE_BATCH_SIZE
             cursor.execute(query)
             columns = [description[0] for description in cursor.description]
             
-            with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+            with CSVHandler.open_csv(csv_path, 'w') as csvfile:
                 # Add custom columns for our processing
                 custom_columns = [
                     'file_exists', 'actual_file_path', 'file_mtime', 
                     'file_mtime_timestamp', 'path_was_mapped', 'new_updated_at'
                 ]
-                all_columns = columns + custom_columns
                 
-                writer = csv.DictWriter(csvfile, fieldnames=all_columns)
-                writer.writeheader()
+                writer = csv.writer(csvfile)
+                writer.writerow(columns + custom_columns)
                 
-                rows_processed = 0
-                files_found = 0
+                stats = {'rows_processed': 0, 'files_found': 0}
+                buffer = []
+                buffer_append = buffer.append
                 
-                for row in cursor:
-                    row_dict = dict(zip(columns, row))
-                    
-                    # Get file modification time using path mapping
-                    original_path = row_dict['original_file_path']
-                    file_mtime, actual_path, exists = path_mapper.get_file_info(original_path)
-                    
-                    # Add custom fields
-                    row_dict['file_exists'] = 'true' if exists else 'false'
-                    row_dict['actual_file_path'] = actual_path or ''
-                    row_dict['file_mtime'] = file_mtime.isoformat() if file_mtime else ''
-                    row_dict['file_mtime_timestamp'] = int(file_mtime.timestamp()) if file_mtime else ''
-                    row_dict['path_was_mapped'] = 'true' if actual_path != original_path else 'false'
-                    
-                    # Set new_updated_at to file mtime if file exists, otherwise keep original
-                    if exists and file_mtime:
-                        row_dict['new_updated_at'] = int(file_mtime.timestamp())
-                        files_found += 1
-                    else:
-                        row_dict['new_updated_at'] = row_dict['updated_at']
-                    
-                    writer.writerow(row_dict)
-                    rows_processed += 1
-                    
-                    if rows_processed % 100 == 0:
-                        logger.info(f"Processed {rows_processed} records...")
+                # SQLite stays on this thread; only the filesystem probes are fanned out
+                with stat_executor(stat_workers) as executor:
+                    for out_row in CSVHandler._iter_export_rows(cursor, path_mapper, executor, stats):
+                        buffer_append(out_row)
+                        if len(buffer) == _CSV_WRITE_BUFFER_ROWS:
+                            writer.writerows(buffer)
+                            buffer.clear()
+                            logger.info(f"Processed {stats['rows_processed']} records...")
+                    writer.writerows(buffer)
+                
+                rows_processed = stats['rows_processed']
+                files_found = stats['files_found']
             
             conn.close()
             
@@ -245,6 +671,77 @@ class CSVHandler:
             logger.error(f"Error exporting to CSV: {e}")
             return False
     
+    @staticmethod
+    def _iter_export_rows(cursor: sqlite3.Cursor, path_mapper: PlexPathMapper,
+                          executor: Optional[ThreadPoolExecutor], stats: Dict[str, int]) -> Iterator[Tuple]:
+        """
+        Yield export rows: the queried columns followed by the computed file columns.
+        
+        Rows are fetched in batches of cursor.arraysize and the files of each
+        batch are probed together; stats is updated as batches complete.
+        """
+        columns = [description[0] for description in cursor.description]
+        path_idx = columns.index('original_file_path')
+        updated_at_idx = columns.index('updated_at')
+        
+        for batch, file_infos in CSVHandler._iter_probed_batches(cursor, path_mapper, executor, path_idx):
+            files_found = 0
+            for row, (file_mtime, actual_path, exists) in zip(batch, file_infos):
+                original_path = row[path_idx]
+                
+                # Set new_updated_at to file mtime if file exists, otherwise keep original
+                if exists and file_mtime:
+                    mtime_ts = int(file_mtime.timestamp())
+                    new_updated_at = mtime_ts
+                    files_found += 1
+                else:
+                    mtime_ts = ''
+                    new_updated_at = row[updated_at_idx]
+                
+                yield row + (
+                    'true' if exists else 'false',
+                    actual_path or '',
+                    file_mtime.isoformat() if file_mtime else '',
+                    mtime_ts,
+                    'true' if actual_path != original_path else 'false',
+                    new_updated_at,
+                )
+            
+            stats['rows_processed'] += len(batch)
+            stats['files_found'] += files_found
+    
+    @staticmethod
+    def _iter_probed_batches(cursor: sqlite3.Cursor, path_mapper: PlexPathMapper,
+                             executor: Optional[ThreadPoolExecutor], path_idx: int
+                             ) -> Iterator[Tuple[List[Tuple], List[Tuple]]]:
+        """
+        Yield (rows, file_infos) per fetched batch, probing files one batch ahead.
+        
+        With an executor, the files of the next batch are probed in the
+        background while the caller consumes the current one, so CSV writing
+        and SQLite fetching overlap with filesystem latency. At most two
+        batches are held at a time; without an executor batches are probed
+        serially. The cursor is only used from the calling thread.
+        """
+        def probe(batch: List[Tuple]) -> List[Tuple]:
+            return path_mapper.get_file_info_batch([row[path_idx] for row in batch], executor)
+        
+        batch = cursor.fetchmany()
+        if executor is None:
+            while batch:
+                yield batch, probe(batch)
+                batch = cursor.fetchmany()
+            return
+        
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(probe, batch) if batch else None
+            while pending is not None:
+                next_batch = cursor.fetchmany()
+                file_infos = pending.result()
+                pending = prefetcher.submit(probe, next_batch) if next_batch else None
+                yield batch, file_infos
+                batch = next_batch
+    
     @staticmethod
     def create_db_from_csv(csv_path: str, template_db_path: str, output_db_path: str,
                           fix_invalid_dates: bool = True) -> bool:
@@ -267,29 +764,37 @@ class CSVHandler:
             
             # Read CSV data
             updates = {}
-            with open(csv_path, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
+            skipped_no_change = 0
+            with CSVHandler.open_csv(csv_path, 'r') as csvfile:
+                rows = CSVHandler._read_columns(csvfile, [
+                    ('id', None), ('new_updated_at', None), ('updated_at', None), ('file_exists', None)
+                ])
                 
-                for row in reader:
-                    if row.get('file_exists') == 'true' and row.get('new_updated_at'):
-                        metadata_id = int(row['id'])
-                        new_timestamp = int(row['new_updated_at'])
-                        
-                        # Validate timestamp if requested
-                        if fix_invalid_dates:
-                            current_year = datetime.now().year
-                            try:
-                                dt = datetime.fromtimestamp(new_timestamp)
-                                if dt.year > current_year + 1 or dt.year < 1970:
-                                    logger.warning(f"Skipping invalid timestamp for item {metadata_id}: {dt}")
-                                    continue
-                            except (ValueError, OSError):
-                                logger.warning(f"Invalid timestamp for item {metadata_id}: {new_timestamp}")
-                                continue
+                for metadata_id, new_updated_at, updated_at, file_exists in rows:
+                    if file_exists == 'true' and new_updated_at:
+                        # Rows whose timestamp already matches would only rewrite the same value
+                        if updated_at == new_updated_at:
+                            skipped_no_change += 1
+                            continue
                         
-                        updates[metadata_id] = new_timestamp
+                        updates[int(metadata_id)] = int(new_updated_at)
             
-            if not updates:
+            if skipped_no_change:
+                logger.info(f"Skipping {skipped_no_change} items whose timestamp is unchanged")
+            if not updates and skipped_no_change:
+                logger.info(f"All timestamps already up to date in {output_db_path}")
+                return True
+            
+            # Validate timestamps if requested, in one pass over the collected updates
+            if fix_invalid_dates:
+                min_ts, max_ts = valid_timestamp_range()
+                pairs = [(ts, mid) for mid, ts in updates.items() if min_ts <= ts < max_ts]
+                if len(pairs) < len(updates):
+                    logger.warning(f"Skipping {len(updates) - len(pairs)} items with invalid timestamps")
+            else:
+                pairs = [(ts, mid) for mid, ts in updates.items()]
+            
+            if not pairs:
                 logger.error("No valid updates found in CSV")
                 return False
             
@@ -299,22 +804,30 @@ class CSVHandler:
                 # Use same pragmas as before for compatibility
                 conn.execute("PRAGMA ignore_check_constraints = ON")
                 conn.execute("PRAGMA synchronous = OFF")
+                conn.execute("PRAGMA temp_store = MEMORY")
+                conn.execute("PRAGMA cache_size = -200000")
+                
+                # Keep the rollback journal in memory while rewriting the copy, so a
+                # failed batch can still be rolled back; restore the mode afterwards
+                journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
                 conn.execute("PRAGMA journal_mode = MEMORY")
                 
                 cursor = conn.cursor()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    cursor.executemany(
+                        "UPDATE metadata_items SET updated_at = ? WHERE id = ?",
+                        pairs
+                    )
+                    conn.commit()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    logger.error(f"Failed to apply updates: {e}")
+                    return False
+                finally:
+                    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
                 
-                successful_updates = 0
-                for metadata_id, new_timestamp in updates.items():
-                    try:
-                        cursor.execute(
-                            "UPDATE metadata_items SET updated_at = ? WHERE id = ?",
-                            (new_timestamp, metadata_id)
-                        )
-                        successful_updates += 1
-                    except sqlite3.Error as e:
-                        logger.warning(f"Failed to update item {metadata_id}: {e}")
-                
-                conn.commit()
+                successful_updates = cursor.rowcount
                 logger.info(f"Successfully updated {successful_updates} entries in {output_db_path}")
                 
                 return successful_updates > 0
@@ -335,29 +848,30 @@ class CSVHandler:
             csv_path: Path to CSV file
         """
         try:
-            with open(csv_path, 'r', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
+            with CSVHandler.open_csv(csv_path, 'r') as csvfile:
+                rows = CSVHandler._read_columns(csvfile, [
+                    ('file_exists', None), ('path_was_mapped', None), ('updated_at', None),
+                    ('new_updated_at', None), ('library_section_id', 'Unknown')
+                ])
+                
+                # Count rows per (exists, mapped, pending, library) combination in one pass
+                groups = Counter(
+                    (exists == 'true', mapped == 'true', updated_at != new_updated_at, lib_id)
+                    for exists, mapped, updated_at, new_updated_at, lib_id in rows
+                )
                 
                 total_records = 0
                 files_exist = 0
                 paths_mapped = 0
                 updates_pending = 0
-                libraries = {}
+                libraries = Counter()
                 
-                for row in reader:
-                    total_records += 1
-                    
-                    if row.get('file_exists') == 'true':
-                        files_exist += 1
-                    
-                    if row.get('path_was_mapped') == 'true':
-                        paths_mapped += 1
-                    
-                    if row.get('updated_at') != row.get('new_updated_at'):
-                        updates_pending += 1
-                    
-                    lib_id = row.get('library_section_id', 'Unknown')
-                    libraries[lib_id] = libraries.get(lib_id, 0) + 1
+                for (exists, mapped, pending, lib_id), count in groups.items():
+                    total_records += count
+                    files_exist += count if exists else 0
+                    paths_mapped += count if mapped else 0
+                    updates_pending += count if pending else 0
+                    libraries[lib_id] += count
                 
                 print(f"\nCSV Analysis for: {csv_path}")
                 print("=" * 60)
@@ -390,15 +904,24 @@ class PlexDatabaseManager:
         
         if not self.db_path.is_file():
             raise FileNotFoundError(f"Database not found at: {db_path}")
+        
+        # One read connection is kept for the lifetime of the manager
+        self._conn = open_read_connection(str(self.db_path))
+    
+    def __enter__(self) -> 'PlexDatabaseManager':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close the shared database connection."""
+        self._conn.close()
     
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(str(self.db_path))
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """Context manager yielding the shared read-only database connection."""
+        yield self._conn
     
     def analyze_path_mappings(self, limit: int = 10) -> Dict[str, int]:
         """
@@ -412,48 +935,39 @@ class PlexDatabaseManager:
         """
         logger.info("=== PATH MAPPING ANALYSIS ===")
         
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            sql = ""
-            if limit > 0:
-                cursor.execute(
-                    "SELECT file FROM media_parts WHERE file IS NOT NULL AND LENGTH(file) > 0 LIMIT ?;",
-                    (limit,)
-                )
-            else:
-                cursor.execute(
-                    "SELECT file FROM media_parts WHERE file IS NOT NULL AND LENGTH(file) > 0;"
-                )
-            paths = [row[0] for row in cursor.fetchall()]
+        sql = "SELECT file FROM media_parts WHERE file IS NOT NULL AND LENGTH(file) > 0"
+        params: Tuple = ()
+        if limit > 0:
+            sql += " LIMIT ?"
+            params = (limit,)
         
-        logger.info(f"Analyzing {len(paths)} file paths...")
+        logger.info("Analyzing file paths...")
+        
+        # Stream paths straight off the cursor and tally outcomes in one Counter
+        counts: Counter = Counter()
+        with self.get_connection() as conn:
+            for (plex_path,) in conn.execute(sql, params):
+                mapped_path = self.path_mapper.map_path(plex_path)
+                
+                if self.path_mapper.file_exists(plex_path):
+                    outcome, status = 'original_exists', "✓ ORIGINAL"
+                elif mapped_path and self.path_mapper.file_exists(mapped_path):
+                    outcome, status = 'mapped_exists', "✓ MAPPED"
+                else:
+                    outcome, status = 'still_missing', "✗ MISSING"
+                counts[outcome] += 1
+                
+                logger.info(f"{status} | {plex_path}")
+                if mapped_path != plex_path:
+                    logger.info(f"      -> {mapped_path}")
         
         results = {
-            'original_exists': 0,
-            'mapped_exists': 0,
-            'still_missing': 0,
-            'total': len(paths)
+            'original_exists': counts['original_exists'],
+            'mapped_exists': counts['mapped_exists'],
+            'still_missing': counts['still_missing'],
+            'total': sum(counts.values())
         }
         
-        for plex_path in paths:
-            original_exists = Path(plex_path).exists()
-            mapped_path = self.path_mapper.map_path(plex_path)
-            mapped_exists = Path(mapped_path).exists() if mapped_path else False
-            
-            if original_exists:
-                results['original_exists'] += 1
-                status = "✓ ORIGINAL"
-            elif mapped_exists:
-                results['mapped_exists'] += 1
-                status = "✓ MAPPED"
-            else:
-                results['still_missing'] += 1
-                status = "✗ MISSING"
-            
-            logger.info(f"{status} | {plex_path}")
-            if mapped_path != plex_path:
-                logger.info(f"      -> {mapped_path}")
-        
         success_rate = ((results['original_exists'] + results['mapped_exists']) / results['total'] * 100) if results['total'] > 0 else 0.0
         results['success_rate'] = success_rate
         
@@ -465,56 +979,60 @@ class PlexDatabaseManager:
         
         return results
     
-    def get_recent_media(self, limit: int = 30, sort_by: str = 'file_mtime') -> Tuple[List[Dict], List[Tuple]]:
+    def get_recent_media(self, limit: int = 30, sort_by: str = 'file_mtime',
+                         stat_workers: int = DEFAULT_STAT_WORKERS
+                         ) -> Tuple[List[Dict], List[Tuple], Dict[int, Dict]]:
         """
         Get recent media with path mapping correction.
         
         Args:
             limit: Maximum number of entries to return
             sort_by: Field to sort by
+            stat_workers: Threads used to probe files; 1 probes serially
             
         Returns:
-            Tuple of (entries, updates)
+            Tuple of (entries, updates, entries_by_id), where entries_by_id
+            maps each item_id in entries to its entry
         """
         entries = []
         updates = []
         
-        query = """
-            SELECT 
-                metadata_items.id,
-                metadata_items.title, 
-                metadata_items.added_at,
-                metadata_items.created_at,
-                metadata_items.updated_at,
-                metadata_items.library_section_id,
-                media_parts.file as file_path
-            FROM metadata_items
-            JOIN media_items ON metadata_items.id = media_items.metadata_item_id
-            JOIN media_parts ON media_items.id = media_parts.media_item_id
-            WHERE metadata_items.title IS NOT NULL
-            AND media_parts.file IS NOT NULL 
-            AND LENGTH(media_parts.file) > 0
-            ORDER BY metadata_items.updated_at DESC;
-        """
+        # Database timestamps can be sorted and limited by SQLite; file times
+        # are only known after probing every file, so those sort in Python
+        sort_in_sql = sort_by in _SQL_SORT_COLUMNS
+        if sort_in_sql:
+            query = _SELECT_SQL[sort_by]
+            params: Tuple = (limit,)
+        else:
+            query = _SELECT_SQL['file_mtime']
+            params = ()
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query)
+            cursor.execute(query, params)
             rows = cursor.fetchall()
         
         logger.info(f"Processing {len(rows)} media files with path mapping...")
         
         stats = {'files_found': 0, 'files_mapped': 0, 'files_missing': 0}
         
-        for item_id, title, added_at, created_at, updated_at, library_section_id, file_path in rows:
+        # Get file modification times with path mapping (file_path is the last column)
+        # Probe in bounded batches so each batch's directory listings stay
+        # cached until its own lookups have run
+        file_infos = []
+        with stat_executor(stat_workers) as executor:
+            for start in range(0, len(rows), _PROBE_BATCH_SIZE):
+                file_infos.extend(self.path_mapper.get_file_info_batch(
+                    [row[-1] for row in rows[start:start + _PROBE_BATCH_SIZE]], executor
+                ))
+        
+        for (item_id, title, added_at, created_at, updated_at, library_section_id, file_path), \
+                (file_mtime, actual_path, exists) in zip(rows, file_infos):
             entry = self._create_entry(
                 item_id, title, added_at, created_at, updated_at,
                 library_section_id, file_path
             )
             
-            # Get file modification time with path mapping
-            file_mtime, actual_path, exists = self.path_mapper.get_file_info(file_path)
-            
             if exists:
                 entry["file_mtime"] = file_mtime
                 entry["actual_path"] = actual_path
@@ -537,52 +1055,64 @@ class PlexDatabaseManager:
             f"{stats['files_mapped']} mapped, {stats['files_missing']} missing"
         )
         
-        # Sort entries
-        entries = self._sort_entries(entries, sort_by)
-        entries = entries[:limit]
+        if not sort_in_sql:
+            # Sort entries, keeping only the newest ones
+            entries = self._sort_entries(entries, sort_by, limit)
+        
+        # Index the final entries once; an item with several files maps to
+        # one whose file exists, if any
+        entries_by_id: Dict[int, Dict] = {}
+        for entry in entries:
+            if entry['file_exists'] or entry['item_id'] not in entries_by_id:
+                entries_by_id[entry['item_id']] = entry
         
-        # Filter updates to match limited entries
-        limited_item_ids = {entry['item_id'] for entry in entries}
-        updates = [(mtime, item_id) for mtime, item_id in updates if item_id in limited_item_ids]
+        if not sort_in_sql:
+            # Filter updates to match limited entries
+            updates = [(mtime, item_id) for mtime, item_id in updates if item_id in entries_by_id]
         
-        return entries, updates
+        return entries, updates, entries_by_id
     
     def _create_entry(self, item_id: int, title: str, added_at: Any, created_at: Any,
                       updated_at: Any, library_section_id: int, file_path: str) -> Dict:
         """Create a media entry dictionary."""
-        entry = {
+        # Keep Plex timestamps as raw Unix seconds, which is all sorting needs;
+        # missing or non-positive values stay None
+        return {
             "item_id": item_id,
             "title": title,
             "library_section_id": library_section_id,
-            "added_at": None,
-            "created_at": None,
-            "updated_at": None,
+            "added_at": added_at if isinstance(added_at, (int, float)) and added_at > 0 else None,
+            "created_at": created_at if isinstance(created_at, (int, float)) and created_at > 0 else None,
+            "updated_at": updated_at if isinstance(updated_at, (int, float)) and updated_at > 0 else None,
             "plex_path": file_path,
             "actual_path": None,
             "file_mtime": None,
             "file_exists": False,
             "path_mapped": False
         }
+    
+    def _sort_entries(self, entries: List[Dict], sort_by: str, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Sort entries by specified field, newest first.
         
-        # Convert Plex timestamps
-        for field_name, timestamp in [
-            ('added_at', added_at),
-            ('created_at', created_at),
-            ('updated_at', updated_at)
-        ]:
-            if isinstance(timestamp, (int, float)) and timestamp > 0:
-                entry[field_name] = datetime.fromtimestamp(timestamp)
+        Entries without a value keep their order after all others. When limit
+        is given only the top entries are kept; they are selected with a heap
+        instead of sorting the whole list.
+        """
+        if sort_by not in ('file_mtime', 'added_at', 'created_at', 'updated_at'):
+            return entries[:limit]
         
-        return entry
-    
-    def _sort_entries(self, entries: List[Dict], sort_by: str) -> List[Dict]:
-        """Sort entries by specified field."""
-        if sort_by == 'file_mtime':
-            return sorted(entries, key=lambda x: x['file_mtime'] or datetime.min, reverse=True)
-        elif sort_by in ['added_at', 'created_at', 'updated_at']:
-            return sorted(entries, key=lambda x: x[sort_by] or datetime.min, reverse=True)
-        else:
-            return entries
+        # Set aside entries without a value so the sort key needs no fallback
+        present = []
+        missing = []
+        for entry in entries:
+            (present if entry[sort_by] else missing).append(entry)
+        
+        key = itemgetter(sort_by)
+        if limit is not None and limit <= len(present):
+            return heapq.nlargest(limit, present, key=key)
+        present.sort(key=key, reverse=True)
+        return (present + missing)[:limit]
     
     def update_database_copy(self, updates: List[Tuple], output_path: str,
                            fix_invalid_dates: bool = True) -> bool:
@@ -600,58 +1130,25 @@ class PlexDatabaseManager:
         import subprocess
         
         try:
-            # Common locations for Plex SQLite binary
-            home_dir = os.path.expanduser("~")
-            plex_sqlite_paths = [
-                # User installations
-                os.path.join(home_dir, "Plex Media Server", "Plex SQLite"),
-                os.path.join(home_dir, "plexmediaserver", "Plex SQLite"),
-                # System installations
-                "/usr/lib/plexmediaserver/Plex SQLite",
-                "/opt/plexmediaserver/Plex SQLite",
-                "/usr/local/plexmediaserver/Plex SQLite",
-                "/var/packages/PlexMediaServer/target/Plex SQLite",  # Synology
-                "/usr/pbi/plexmediaserver-amd64/share/plexmediaserver/Plex SQLite",  # FreeBSD
-                "/usr/local/share/plexmediaserver/Plex SQLite",  # Some Linux distros
-                # Snap installation
-                "/snap/plexmediaserver/current/Plex SQLite",
-                # Docker common paths
-                "/app/Plex SQLite",
-            ]
-            
-            # Find Plex SQLite binary
-            plex_sqlite = None
-            for path in plex_sqlite_paths:
-                if os.path.exists(path):
-                    plex_sqlite = path
-                    logger.info(f"Found Plex SQLite at: {plex_sqlite}")
-                    break
-            
-            # Try to find it using which/whereis
-            if not plex_sqlite:
-                try:
-                    result = subprocess.run(['which', 'Plex SQLite'], capture_output=True, text=True)
-                    if result.returncode == 0 and result.stdout.strip():
-                        plex_sqlite = result.stdout.strip()
-                        logger.info(f"Found Plex SQLite via which: {plex_sqlite}")
-                except (subprocess.CalledProcessError, FileNotFoundError):
-                    pass
+            plex_sqlite = find_plex_sqlite()
             
             logger.info(f"Creating database copy at {output_path}")
             
             # Use Plex SQLite if available
-            if plex_sqlite and os.path.exists(plex_sqlite):
+            if plex_sqlite:
                 logger.info("Using Plex SQLite for database copy")
-                # Escape paths for shell
-                escaped_db = str(self.db_path).replace("'", "'\"'\"'")
-                escaped_output = output_path.replace("'", "'\"'\"'")
-                
-                # Use .backup command
-                cmd = [plex_sqlite, escaped_db, f".backup '{escaped_output}'"]
-                result = subprocess.run(' '.join(cmd), shell=True, capture_output=True, text=True)
+                # Use .backup command; argv is passed directly, no shell involved
+                try:
+                    result = subprocess.run(
+                        [plex_sqlite, str(self.db_path), f".backup {quote_dot_command_arg(str(output_path))}"],
+                        capture_output=True, text=True, timeout=600
+                    )
+                    backup_error = result.stderr if result.returncode != 0 else None
+                except (OSError, subprocess.TimeoutExpired) as e:
+                    backup_error = str(e)
                 
-                if result.returncode != 0:
-                    logger.error(f"Plex SQLite backup failed: {result.stderr}")
+                if backup_error is not None:
+                    logger.error(f"Plex SQLite backup failed: {backup_error}")
                     # Fall back to file copy
                     copy2(str(self.db_path), output_path)
             else:
@@ -666,32 +1163,30 @@ class PlexDatabaseManager:
                 conn.execute("PRAGMA ignore_check_constraints = ON")
                 conn.execute("PRAGMA synchronous = OFF")
                 conn.execute("PRAGMA journal_mode = MEMORY")
+                conn.execute("PRAGMA temp_store = MEMORY")
                 
                 cursor = conn.cursor()
                 
-                successful_updates = 0
-                for mtime, item_id in updates:
-                    # Validate timestamp if requested
-                    if fix_invalid_dates:
-                        current_year = datetime.now().year
-                        mtime_dt = datetime.fromtimestamp(mtime)
-                        
-                        if mtime_dt.year > current_year + 1 or mtime_dt.year < 1970:
-                            logger.warning(
-                                f"Skipping invalid timestamp for item {item_id}: {mtime_dt}"
-                            )
-                            continue
-                    
-                    try:
-                        cursor.execute(
+                # Validate timestamps if requested, so the write loop has no checks left
+                if fix_invalid_dates:
+                    min_ts, max_ts = valid_timestamp_range()
+                    valid_updates = [(mtime, item_id) for mtime, item_id in updates if min_ts <= mtime < max_ts]
+                    if len(valid_updates) < len(updates):
+                        logger.warning(f"Skipping {len(updates) - len(valid_updates)} items with invalid timestamps")
+                    updates = valid_updates
+                
+                # One transaction for the whole batch; rolled back as a unit on failure
+                try:
+                    with conn:
+                        cursor.executemany(
                             "UPDATE metadata_items SET updated_at = ? WHERE id = ?",
-                            (mtime, item_id)
+                            updates
                         )
-                        successful_updates += 1
-                    except sqlite3.Error as e:
-                        logger.warning(f"Failed to update item {item_id}: {e}")
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to apply updates: {e}")
+                    return False
                 
-                conn.commit()
+                successful_updates = cursor.rowcount
                 logger.info(f"Successfully updated {successful_updates} entries")
                 
                 return successful_updates > 0
@@ -716,39 +1211,39 @@ class ResultDisplay:
             print("No entries found.")
             return
         
-        # Count invalid timestamps
-        invalid_timestamps = 0
-        current_year = datetime.now().year
-        
-        for entry in entries:
-            file_mtime = entry.get('file_mtime')
-            if file_mtime and (file_mtime.year > current_year + 1 or file_mtime.year < 1970):
-                invalid_timestamps += 1
+        # Flag invalid timestamps once; the flags drive both the count and the row markers
+        max_year = datetime.now().year + 1
+        invalid_flags = [
+            file_mtime is not None and not 1970 <= file_mtime.year <= max_year
+            for file_mtime in (entry.get('file_mtime') for entry in entries)
+        ]
+        invalid_timestamps = sum(invalid_flags)
         
         print(f"\nTop {len(entries)} Media Items (with path mapping):")
         if invalid_timestamps > 0:
             print(f"⚠️  Found {invalid_timestamps} files with invalid timestamps (future/past dates)")
         
         print("=" * 140)
-        print(f"{'Title':<30} {'Lib':<3} {'File Modified':<20} {'Mapped':<6} {'Status':<8} {'File':<25}")
+        print(_ROW_FMT('Title', 'Lib', 'File Modified', 'Mapped', 'Status', 'File'))
         print("-" * 140)
         
-        for entry in entries:
-            ResultDisplay._display_entry(entry, current_year)
+        # Write all rows with a single print instead of one per entry
+        print("\n".join([
+            ResultDisplay._format_entry(entry, invalid) for entry, invalid in zip(entries, invalid_flags)
+        ]))
     
     @staticmethod
-    def _display_entry(entry: Dict, current_year: int) -> None:
-        """Display a single entry."""
+    def _format_entry(entry: Dict, invalid: bool) -> str:
+        """Format a single entry as a table row."""
         title = entry.get('title', 'N/A')[:29]
         lib_id = str(entry.get('library_section_id', 'N/A'))
         
         file_mtime = entry.get('file_mtime')
         if file_mtime:
+            file_mtime_str = file_mtime.strftime('%Y-%m-%d %H:%M:%S')
             # Mark invalid timestamps
-            if file_mtime.year > current_year + 1 or file_mtime.year < 1970:
-                file_mtime_str = f"{file_mtime.strftime('%Y-%m-%d %H:%M:%S')} ⚠️"
-            else:
-                file_mtime_str = file_mtime.strftime('%Y-%m-%d %H:%M:%S')
+            if invalid:
+                file_mtime_str += ' ⚠️'
         else:
             file_mtime_str = 'N/A'
         
@@ -756,10 +1251,51 @@ class ResultDisplay:
         exists = 'Found' if entry.get('file_exists') else 'Missing'
         
         actual_path = entry.get('actual_path') or entry.get('plex_path', '')
-        filename = os.path.basename(actual_path) if actual_path else 'N/A'
-        filename = filename[:24] if len(filename) > 24 else filename
+        filename = actual_path.rpartition('/')[2][:24] if actual_path else 'N/A'
         
-        print(f"{title:<30} {lib_id:<3} {file_mtime_str:<20} {mapped:<6} {exists:<8} {filename:<25}")
+        return _ROW_FMT(title, lib_id, file_mtime_str, mapped, exists, filename)
+
+
+@functools.lru_cache(maxsize=None)
+def find_plex_sqlite() -> Optional[str]:
+    """
+    Locate the Plex SQLite binary, searching PATH and common install locations.
+    
+    The result is cached for the lifetime of the process.
+    
+    Returns:
+        Path to the binary, or None if it was not found
+    """
+    plex_sqlite = shutil.which("Plex SQLite")
+    if plex_sqlite:
+        logger.info(f"Found Plex SQLite via PATH: {plex_sqlite}")
+        return plex_sqlite
+    
+    # Common locations for Plex SQLite binary
+    home_dir = os.path.expanduser("~")
+    plex_sqlite_paths = [
+        # User installations
+        os.path.join(home_dir, "Plex Media Server", "Plex SQLite"),
+        os.path.join(home_dir, "plexmediaserver", "Plex SQLite"),
+        # System installations
+        "/usr/lib/plexmediaserver/Plex SQLite",
+        "/opt/plexmediaserver/Plex SQLite",
+        "/usr/local/plexmediaserver/Plex SQLite",
+        "/var/packages/PlexMediaServer/target/Plex SQLite",  # Synology
+        "/usr/pbi/plexmediaserver-amd64/share/plexmediaserver/Plex SQLite",  # FreeBSD
+        "/usr/local/share/plexmediaserver/Plex SQLite",  # Some Linux distros
+        # Snap installation
+        "/snap/plexmediaserver/current/Plex SQLite",
+        # Docker common paths
+        "/app/Plex SQLite",
+    ]
+    
+    for path in plex_sqlite_paths:
+        if os.path.exists(path):
+            logger.info(f"Found Plex SQLite at: {path}")
+            return path
+    
+    return None
 
 
 def get_sqlite_executable(config_path="sqlite.conf"):
@@ -783,7 +1319,7 @@ def main():
     parser.add_argument("--output", type=str, default=os.path.expanduser("~/plex_fixed_dates.db"),
                        help="Output path for modified database.")
     parser.add_argument("--export-csv", type=str, metavar="PATH",
-                       help="Export complete media data to CSV file.")
+                       help="Export complete media data to CSV file (gzip-compressed if PATH ends in .gz).")
     parser.add_argument("--import-csv", type=str, metavar="PATH",
                        help="Create database from CSV file (requires --output).")
     parser.add_argument("--analyze-csv", type=str, metavar="PATH",
@@ -796,6 +1332,10 @@ def main():
     parser.add_argument("--limit", type=int, default=30, help="Number of entries to process.")
     parser.add_argument("--sort-by", choices=['file_mtime', 'added_at', 'created_at', 'updated_at'],
                        default='file_mtime', help="Sort by this field.")
+    parser.add_argument("--stat-workers", type=int, default=DEFAULT_STAT_WORKERS,
+                       help="Threads used to check files on disk; 1 checks them one at a time.")
+    parser.add_argument("--prefer-mapped", action="store_true",
+                       help="Check mapped paths before original ones (faster when the original paths no longer exist).")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable debug logging.")
     parser.add_argument("--use-plex-sqlite", action="store_true", 
                        help="Use Plex's SQLite binary if available (recommended for --write).")
@@ -822,12 +1362,18 @@ def main():
         )
         return 0 if success else 1
     
+    # One mapper (and its prefix caches) serves every mode below
+    try:
+        path_mapper = PlexPathMapper(prefer_mapped=args.prefer_mapped)
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        return 1
+    
     # Handle CSV export mode
     if args.export_csv:
         logger.info(f"Exporting complete media data to CSV: {args.export_csv}")
-        path_mapper = PlexPathMapper()
         success = CSVHandler.export_full_media_data_to_csv(
-            args.db, args.export_csv, path_mapper, args.limit
+            args.db, args.export_csv, path_mapper, args.limit, args.stat_workers
         )
         if success:
             print(f"\nExported media data to: {args.export_csv}")
@@ -838,54 +1384,55 @@ def main():
     
     try:
         # Initialize components
-        path_mapper = PlexPathMapper()
-        db_manager = PlexDatabaseManager(args.db, path_mapper)
-        
-        if args.analyze:
-            db_manager.analyze_path_mappings(args.limit)
-        else:
-            entries, updates = db_manager.get_recent_media(args.limit, args.sort_by)
-            ResultDisplay.display_entries(entries)
-            
-            # Filter valid updates
-            valid_updates = [
-                (mtime, item_id) for mtime, item_id in updates 
-                if any(e['item_id'] == item_id and e['file_exists'] for e in entries)
-            ]
-            
-            if not valid_updates:
-                print("No valid file updates to apply.")
-                return 1
-            
-            print(f"\nFound {len(valid_updates)} files with valid modification times.")
+        with PlexDatabaseManager(args.db, path_mapper) as db_manager:
             
-            # Write to database if requested
-            if args.write:
-                print(f"\nPreparing to update {len(valid_updates)} files with real modification times...")
+            if args.analyze:
+                db_manager.analyze_path_mappings(args.limit)
+            else:
+                entries, updates, entries_by_id = db_manager.get_recent_media(
+                    args.limit, args.sort_by, args.stat_workers
+                )
+                ResultDisplay.display_entries(entries)
                 
-                if args.use_plex_sqlite:
-                    sqlite_exec = get_sqlite_executable()
-                    if not shutil.which(sqlite_exec):
-                        print(f"Could not find Plex SQLite executable: {sqlite_exec}. Please check ./sqlite.conf or your PATH.")
-                        return 1
-                    # Use the executable for backup/export
-                    print(f"Using Plex SQLite executable: {sqlite_exec}")
-                    # Example: run backup
-                    backup_cmd = [sqlite_exec, args.db, f".backup {args.output}"]
-                    import subprocess
-                    result = subprocess.run(backup_cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        print("Backup failed:", result.stderr)
-                        return 1
-                    print("Backup completed. Now apply updates using the Plex SQLite binary if needed.")
-                    return 0
+                # Filter valid updates
+                valid_updates = [
+                    (mtime, item_id) for mtime, item_id in updates
+                    if item_id in entries_by_id and entries_by_id[item_id]['file_exists']
+                ]
                 
-                success = db_manager.update_database_copy(
-                    valid_updates, args.output, args.fix_invalid_dates
-                )
-                return 0 if success else 1
-        
-        return 0
+                if not valid_updates:
+                    print("No valid file updates to apply.")
+                    return 1
+                
+                print(f"\nFound {len(valid_updates)} files with valid modification times.")
+                
+                # Write to database if requested
+                if args.write:
+                    print(f"\nPreparing to update {len(valid_updates)} files with real modification times...")
+                    
+                    if args.use_plex_sqlite:
+                        sqlite_exec = get_sqlite_executable()
+                        if not shutil.which(sqlite_exec):
+                            print(f"Could not find Plex SQLite executable: {sqlite_exec}. Please check ./sqlite.conf or your PATH.")
+                            return 1
+                        # Use the executable for backup/export
+                        print(f"Using Plex SQLite executable: {sqlite_exec}")
+                        # Example: run backup
+                        backup_cmd = [sqlite_exec, args.db, f".backup {quote_dot_command_arg(args.output)}"]
+                        import subprocess
+                        result = subprocess.run(backup_cmd, capture_output=True, text=True)
+                        if result.returncode != 0:
+                            print("Backup failed:", result.stderr)
+                            return 1
+                        print("Backup completed. Now apply updates using the Plex SQLite binary if needed.")
+                        return 0
+                    
+                    success = db_manager.update_database_copy(
+                        valid_updates, args.output, args.fix_invalid_dates
+                    )
+                    return 0 if success else 1
+            
+            return 0
         
     except FileNotFoundError as e:
         logger.error(f"Error: {e}")
@@ -900,375 +1447,34 @@ def main():
 
 # ======================== TESTS ========================
 
-import unittest
-import tempfile
-import shutil
-from unittest.mock import Mock, patch, MagicMock
-
-
-class TestPlexPathMapper(unittest.TestCase):
-    """Test cases for PlexPathMapper class."""
-    
-    def setUp(self):
-        # Create a temporary config file for path mappings
-        self.temp_dir = tempfile.mkdtemp()
-        self.config_path = os.path.join(self.temp_dir, "path_mappings.conf")
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            f.write("/unittest/,/home/unittest/\n")
-        self.mapper = PlexPathMapper(config_path=self.config_path)
-
-    def tearDown(self):
-        import shutil
-        shutil.rmtree(self.temp_dir)
-
-    def test_map_path_with_mapping(self):
-        """Test path mapping with matching prefix."""
-        result = self.mapper.map_path("/unittest/movies/movie.mkv")
-        self.assertEqual(result, "/home/unittest/movies/movie.mkv")
-    
-    def test_map_path_without_mapping(self):
-        """Test path mapping without matching prefix."""
-        result = self.mapper.map_path("/other/path/file.mkv")
-        self.assertEqual(result, "/other/path/file.mkv")
+def _run_tests() -> int:
+    """
+    Run the test suite in test_plex_tool.py.
     
-    def test_map_path_empty(self):
-        """Test path mapping with empty string."""
-        result = self.mapper.map_path("")
-        self.assertEqual(result, "")
+    The test framework is imported here rather than at module level, so
+    normal CLI runs do not pay for loading unittest and unittest.mock.
     
-    def test_map_path_none(self):
-        """Test path mapping with None."""
-        result = self.mapper.map_path(None)
-        self.assertIsNone(result)
+    Returns:
+        0 if every test passed, 1 otherwise
+    """
+    import unittest
+    import test_plex_tool
     
-    def test_custom_mappings(self):
-        """Test with custom path mappings via config file."""
-        # Write a new config file with a different mapping
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            f.write("/old/,/new/\n")
-        custom_mapper = PlexPathMapper(config_path=self.config_path)
-        result = custom_mapper.map_path("/old/file.txt")
-        self.assertEqual(result, "/new/file.txt")
-    
-    @patch('pathlib.Path.is_file')
-    @patch('pathlib.Path.stat')
-    def test_get_file_info_original_exists(self, mock_stat, mock_is_file):
-        """Test get_file_info when original path exists."""
-        mock_is_file.return_value = True
-        mock_stat.return_value = Mock(st_mtime=1234567890)
-        
-        mtime, path, exists = self.mapper.get_file_info("/test/file.mkv")
-        
-        self.assertIsNotNone(mtime)
-        self.assertEqual(path, "/test/file.mkv")
-        self.assertTrue(exists)
-    
-    @patch('pathlib.Path.is_file')
-    @patch('pathlib.Path.stat')
-    def test_get_file_info_mapped_exists(self, mock_stat, mock_is_file):
-        """Test get_file_info when only mapped path exists."""
-        # First call for original path returns False, second for mapped returns True
-        mock_is_file.side_effect = [False, True]
-        mock_stat.return_value = Mock(st_mtime=1234567890)
-        
-        mtime, path, exists = self.mapper.get_file_info("/unittest/file.mkv")
-        
-        self.assertIsNotNone(mtime)
-        self.assertEqual(path, "/home/unittest/file.mkv")
-        self.assertTrue(exists)
-    
-    @patch('pathlib.Path.is_file')
-    def test_get_file_info_not_exists(self, mock_is_file):
-        """Test get_file_info when file doesn't exist."""
-        mock_is_file.return_value = False
-        
-        mtime, path, exists = self.mapper.get_file_info("/nonexistent/file.mkv")
-        
-        self.assertIsNone(mtime)
-        self.assertIsNone(path)
-        self.assertFalse(exists)
+    suite = unittest.TestLoader().loadTestsFromModule(test_plex_tool)
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    return 0 if result.wasSuccessful() else 1
 
 
-class TestCSVHandler(unittest.TestCase):
-    """Test cases for CSVHandler class."""
-    
-    def setUp(self):
-        self.temp_dir = tempfile.mkdtemp()
-        self.csv_path = os.path.join(self.temp_dir, "test.csv")
-    
-    def tearDown(self):
-        shutil.rmtree(self.temp_dir)
-    
-    def test_analyze_csv(self):
-        """Test CSV analysis functionality."""
-        # Create test CSV
-        with open(self.csv_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'id', 'title', 'file_exists', 'path_was_mapped', 
-                'updated_at', 'new_updated_at', 'library_section_id'
-            ])
-            writer.writeheader()
-            writer.writerow({
-                'id': '1', 'title': 'Test Movie',
-                'file_exists': 'true', 'path_was_mapped': 'true',
-                'updated_at': '1234567890', 'new_updated_at': '1234567891',
-                'library_section_id': '1'
-            })
-            writer.writerow({
-                'id': '2', 'title': 'Test Movie 2',
-                'file_exists': 'false', 'path_was_mapped': 'false',
-                'updated_at': '1234567890', 'new_updated_at': '1234567890',
-                'library_section_id': '1'
-            })
-        
-        # Capture output
-        with patch('builtins.print') as mock_print:
-            CSVHandler.analyze_csv(self.csv_path)
-            
-        # Verify analysis was performed
-        calls = [str(call) for call in mock_print.call_args_list]
-        self.assertTrue(any("Total records: 2" in call for call in calls))
-        self.assertTrue(any("Files found: 1" in call for call in calls))
-    
-    def test_create_db_from_csv_no_updates(self):
-        """Test creating database from CSV with no valid updates."""
-        # Create empty CSV
-        with open(self.csv_path, 'w') as f:
-            f.write("id,file_exists,new_updated_at\n")
-        
-        # Create dummy template db
-        template_db = os.path.join(self.temp_dir, "template.db")
-        output_db = os.path.join(self.temp_dir, "output.db")
-        
-        # Create minimal template database
-        conn = sqlite3.connect(template_db)
-        conn.execute("CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, updated_at INTEGER)")
-        conn.close()
-        
-        result = CSVHandler.create_db_from_csv(self.csv_path, template_db, output_db)
-        
-        self.assertFalse(result)
-
-
-class TestPlexDatabaseManager(unittest.TestCase):
-    """Test cases for PlexDatabaseManager class."""
-    
-    def setUp(self):
-        # Create temporary database
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.temp_dir, "test.db")
-        self._create_test_database()
-        
-        self.mapper = PlexPathMapper()
-        self.db_manager = PlexDatabaseManager(self.db_path, self.mapper)
-    
-    def tearDown(self):
-        shutil.rmtree(self.temp_dir)
-    
-    def _create_test_database(self):
-        """Create a minimal test database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create minimal schema
-        cursor.execute("""
-            CREATE TABLE metadata_items (
-                id INTEGER PRIMARY KEY,
-                title TEXT,
-                added_at INTEGER,
-                created_at INTEGER,
-                updated_at INTEGER,
-                library_section_id INTEGER
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE media_items (
-                id INTEGER PRIMARY KEY,
-                metadata_item_id INTEGER
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE media_parts (
-                id INTEGER PRIMARY KEY,
-                media_item_id INTEGER,
-                file TEXT
-            )
-        """)
-        
-        # Insert test data
-        cursor.execute(
-            "INSERT INTO metadata_items VALUES (1, 'Test Movie', 1234567890, 1234567890, 1234567890, 1)"
-        )
-        cursor.execute("INSERT INTO media_items VALUES (1, 1)")
-        cursor.execute("INSERT INTO media_parts VALUES (1, 1, '/unittest/movies/test.mkv')")
-        
-        conn.commit()
-        conn.close()
-    
-    def test_get_connection(self):
-        """Test database connection context manager."""
-        with self.db_manager.get_connection() as conn:
-            self.assertIsNotNone(conn)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM metadata_items")
-            count = cursor.fetchone()[0]
-            self.assertEqual(count, 1)
-    
-    def test_database_not_found(self):
-        """Test initialization with non-existent database."""
-        with self.assertRaises(FileNotFoundError):
-            PlexDatabaseManager("/nonexistent/path.db", self.mapper)
-    
-    @patch.object(PlexPathMapper, 'get_file_info')
-    def test_get_recent_media(self, mock_get_file_info):
-        """Test getting recent media entries."""
-        mock_get_file_info.return_value = (
-            datetime.fromtimestamp(1234567890),
-            "/home/unittest/movies/test.mkv",
-            True
-        )
-        
-        entries, updates = self.db_manager.get_recent_media(limit=10)
-        
-        self.assertEqual(len(entries), 1)
-        self.assertEqual(entries[0]['title'], 'Test Movie')
-        self.assertTrue(entries[0]['file_exists'])
-        self.assertTrue(entries[0]['path_mapped'])
-    
-    def test_sort_entries(self):
-        """Test entry sorting functionality."""
-        entries = [
-            {'file_mtime': datetime(2023, 1, 1), 'title': 'A'},
-            {'file_mtime': datetime(2023, 1, 3), 'title': 'B'},
-            {'file_mtime': datetime(2023, 1, 2), 'title': 'C'},
-        ]
-        
-        sorted_entries = self.db_manager._sort_entries(entries, 'file_mtime')
-        
-        self.assertEqual(sorted_entries[0]['title'], 'B')
-        self.assertEqual(sorted_entries[1]['title'], 'C')
-        self.assertEqual(sorted_entries[2]['title'], 'A')
-    
-    def test_create_entry(self):
-        """Test entry creation with timestamp conversion."""
-        entry = self.db_manager._create_entry(
-            1, "Test", 1234567890, 1234567890, 1234567890, 1, "/test/file.mkv"
-        )
-        
-        self.assertEqual(entry['item_id'], 1)
-        self.assertEqual(entry['title'], "Test")
-        self.assertIsInstance(entry['added_at'], datetime)
-        self.assertEqual(entry['added_at'].year, 2009)  # 1234567890 = Feb 2009
-
-    def test_analyze_path_mappings_limit(self):
-        """Test analyze_path_mappings with limit=0 and nonzero."""
-        # Insert a second file for nonzero test
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO media_parts VALUES (?, ?, ?)", (2, 1, '/unittest/movies/another.mkv'))
-        conn.commit()
-        conn.close()
-
-        # Test with limit=1 (should return 1 path)
-        results = self.db_manager.analyze_path_mappings(limit=1)
-        self.assertEqual(results['total'], 1)
-        # Test with limit=0 (should return all paths, i.e., 2)
-        results = self.db_manager.analyze_path_mappings(limit=0)
-        self.assertEqual(results['total'], 2)
-
-
-class TestResultDisplay(unittest.TestCase):
-    """Test cases for ResultDisplay class."""
-    
-    @patch('builtins.print')
-    def test_display_entries_empty(self, mock_print):
-        """Test displaying empty entries."""
-        ResultDisplay.display_entries([])
-        mock_print.assert_called_with("No entries found.")
-    
-    @patch('builtins.print')
-    def test_display_entries_with_data(self, mock_print):
-        """Test displaying entries with data."""
-        entries = [{
-            'title': 'Test Movie',
-            'library_section_id': 1,
-            'file_mtime': datetime(2023, 1, 1, 12, 0, 0),
-            'path_mapped': True,
-            'file_exists': True,
-            'actual_path': '/home/unittest/movies/test.mkv'
-        }]
-        
-        ResultDisplay.display_entries(entries)
-        
-        # Check that header was printed
-        calls = [str(call) for call in mock_print.call_args_list]
-        self.assertTrue(any("Top 1 Media Items" in call for call in calls))
-    
-    @patch('builtins.print')
-    def test_display_entries_with_invalid_timestamp(self, mock_print):
-        """Test displaying entries with invalid timestamps."""
-        entries = [{
-            'title': 'Future Movie',
-            'library_section_id': 1,
-            'file_mtime': datetime(2050, 1, 1),  # Future date
-            'path_mapped': False,
-            'file_exists': True,
-            'actual_path': '/test/movie.mkv'
-        }]
-        
-        ResultDisplay.display_entries(entries)
-        
-        # Check that warning was printed
-        calls = [str(call) for call in mock_print.call_args_list]
-        self.assertTrue(any("Found 1 files with invalid timestamps" in call for call in calls))
-
-
-class TestIntegration(unittest.TestCase):
-    """Integration tests for the complete tool."""
-    
-    def setUp(self):
-        # Create a temporary test database
-        self.temp_dir = tempfile.mkdtemp()
-        self.test_db = os.path.join(self.temp_dir, "test.db")
-        self._create_minimal_db()
-    
-    def tearDown(self):
-        shutil.rmtree(self.temp_dir)
-    
-    def _create_minimal_db(self):
-        """Create a minimal test database."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE media_parts (file TEXT)")
-        cursor.execute("INSERT INTO media_parts VALUES ('/test/file.mkv')")
-        conn.commit()
-        conn.close()
-    
-    @patch('sys.argv', ['plex_mapper.py', '--analyze', '--limit', '5'])
-    def test_main_analyze_mode(self):
-        """Test main function in analyze mode."""
-        # Patch sys.argv to include our test database
-        with patch('sys.argv', ['plex_mapper.py', '--analyze', '--limit', '5', '--db', self.test_db]):
-            with patch('pathlib.Path.exists', return_value=True):
-                result = main()
-        
-        self.assertEqual(result, 0)
-    
-    @patch('sys.argv', ['plex_mapper.py', '--db', '/nonexistent/db.db'])
-    def test_main_database_not_found(self):
-        """Test main function with non-existent database."""
-        result = main()
-        self.assertEqual(result, 1)
+def load_tests(loader, tests, pattern):
+    """unittest hook so `python -m unittest plex_tool` runs the suite too."""
+    import test_plex_tool
+    return loader.loadTestsFromModule(test_plex_tool)
 
 
 if __name__ == "__main__":
     # Check if we're running tests
     if len(sys.argv) > 1 and sys.argv[1] == 'test':
-        # Run tests
-        sys.argv = [sys.argv[0]]  # Reset argv for unittest
-        unittest.main(verbosity=2)
+        exit(_run_tests())
     else:
         # Run main program
         exit(main())
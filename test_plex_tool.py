@@ -0,0 +1,1000 @@
+#!/usr/bin/env python3
+"""Tests for plex_tool; run with `python plex_tool.py test` or any unittest/pytest runner."""
+
+import io
+import os
+import csv
+import shutil
+import sqlite3
+import tempfile
+import unicodedata
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+import plex_tool
+from plex_tool import (
+    CSVHandler, PlexDatabaseManager, PlexPathMapper, ResultDisplay,
+    logger, main, open_read_connection, quote_dot_command_arg, stat_executor,
+)
+
+
+class TestPlexPathMapper(unittest.TestCase):
+    """Test cases for PlexPathMapper class."""
+    
+    def setUp(self):
+        # Create a temporary config file for path mappings
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.temp_dir, "path_mappings.conf")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write("/unittest/,/home/unittest/\n")
+        self.mapper = PlexPathMapper(config_path=self.config_path)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_map_path_with_mapping(self):
+        """Test path mapping with matching prefix."""
+        result = self.mapper.map_path("/unittest/movies/movie.mkv")
+        self.assertEqual(result, "/home/unittest/movies/movie.mkv")
+    
+    def test_map_path_without_mapping(self):
+        """Test path mapping without matching prefix."""
+        result = self.mapper.map_path("/other/path/file.mkv")
+        self.assertEqual(result, "/other/path/file.mkv")
+    
+    def test_map_path_empty(self):
+        """Test path mapping with empty string."""
+        result = self.mapper.map_path("")
+        self.assertEqual(result, "")
+    
+    def test_map_path_none(self):
+        """Test path mapping with None."""
+        result = self.mapper.map_path(None)
+        self.assertIsNone(result)
+    
+    def test_custom_mappings(self):
+        """Test with custom path mappings via config file."""
+        # Write a new config file with a different mapping
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write("/old/,/new/\n")
+        custom_mapper = PlexPathMapper(config_path=self.config_path)
+        result = custom_mapper.map_path("/old/file.txt")
+        self.assertEqual(result, "/new/file.txt")
+    
+    def test_map_path_longest_prefix_wins(self):
+        """Test that the most specific mapping is applied."""
+        mapper = PlexPathMapper([("/media/", "/mnt/"), ("/media/movies/", "/nas/movies/")])
+        self.assertEqual(mapper.map_path("/media/movies/a.mkv"), "/nas/movies/a.mkv")
+        self.assertEqual(mapper.map_path("/media/tv/b.mkv"), "/mnt/tv/b.mkv")
+    
+    def test_map_path_without_any_mappings(self):
+        """Test an empty mapping table passes cleaned paths straight through."""
+        mapper = PlexPathMapper([])
+        self.assertEqual(mapper.map_path(" /media/a.mkv "), "/media/a.mkv")
+        self.assertFalse(mapper.has_mapping("/media/a.mkv"))
+        with self.assertRaises(AttributeError):
+            mapper.unexpected = True
+    
+    def test_map_path_reuses_last_directory(self):
+        """Test consecutive paths in one directory skip the prefix lookup."""
+        mapper = PlexPathMapper([("/media/", "/mnt/")])
+        mapper._match_dir_prefix = Mock(wraps=mapper._match_dir_prefix)
+        
+        self.assertEqual(mapper.map_path("/media/tv/a.mkv"), "/mnt/tv/a.mkv")
+        self.assertEqual(mapper.map_path("/media/tv/b.mkv"), "/mnt/tv/b.mkv")
+        self.assertEqual(mapper.map_path("/other/c.mkv"), "/other/c.mkv")
+        self.assertEqual(mapper._match_dir_prefix.call_count, 2)
+    
+    def test_map_path_prefix_beyond_directory(self):
+        """Test prefixes that end inside a file name are still matched."""
+        mapper = PlexPathMapper([("/media/movies/Alien", "/nas/Alien"), ("/media/", "/mnt/")])
+        self.assertEqual(mapper.map_path("/media/movies/Alien.mkv"), "/nas/Alien.mkv")
+        self.assertEqual(mapper.map_path("/media/movies/Aliens/x.mkv"), "/nas/Aliens/x.mkv")
+        self.assertEqual(mapper.map_path("/media/movies/Brazil.mkv"), "/mnt/movies/Brazil.mkv")
+        self.assertEqual(mapper.map_path("/media/movies/Alien.mkv"), "/nas/Alien.mkv")
+    
+    def test_map_path_many_mappings(self):
+        """Test prefix matching with a mapping table large enough for the trie."""
+        mappings = [(f"/lib{i}/", f"/new{i}/") for i in range(20)]
+        mappings.append(("/lib1/sub/", "/deep/"))
+        mapper = PlexPathMapper(mappings)
+        self.assertEqual(mapper.map_path("/lib12/x.mkv"), "/new12/x.mkv")
+        self.assertEqual(mapper.map_path("/lib1/x.mkv"), "/new1/x.mkv")
+        self.assertEqual(mapper.map_path("/lib1/sub/x.mkv"), "/deep/x.mkv")
+        self.assertEqual(mapper.map_path("/lib/x.mkv"), "/lib/x.mkv")
+    
+    def _make_file(self, path, mtime=1234567890):
+        """Create an empty file with the given modification time."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w"):
+            pass
+        os.utime(path, (mtime, mtime))
+    
+    def test_get_file_info_original_exists(self):
+        """Test get_file_info when original path exists."""
+        file_path = os.path.join(self.temp_dir, "test", "file.mkv")
+        self._make_file(file_path)
+        
+        mtime, path, exists = self.mapper.get_file_info(file_path)
+        
+        self.assertEqual(mtime, datetime.fromtimestamp(1234567890))
+        self.assertEqual(path, file_path)
+        self.assertTrue(exists)
+    
+    def test_get_file_info_mapped_exists(self):
+        """Test get_file_info when only mapped path exists."""
+        old_root = os.path.join(self.temp_dir, "old") + os.sep
+        new_root = os.path.join(self.temp_dir, "new") + os.sep
+        self._make_file(os.path.join(new_root, "file.mkv"))
+        mapper = PlexPathMapper([(old_root, new_root)])
+        
+        mtime, path, exists = mapper.get_file_info(os.path.join(old_root, "file.mkv"))
+        
+        self.assertEqual(mtime, datetime.fromtimestamp(1234567890))
+        self.assertEqual(path, os.path.join(new_root, "file.mkv"))
+        self.assertTrue(exists)
+    
+    def test_get_file_info_prefer_mapped(self):
+        """Test mapped paths are probed first and originals are the fallback."""
+        old_root = os.path.join(self.temp_dir, "old") + os.sep
+        new_root = os.path.join(self.temp_dir, "new") + os.sep
+        self._make_file(os.path.join(old_root, "both.mkv"), mtime=1000000000)
+        self._make_file(os.path.join(new_root, "both.mkv"), mtime=1100000000)
+        self._make_file(os.path.join(old_root, "old_only.mkv"), mtime=1200000000)
+        mapper = PlexPathMapper([(old_root, new_root)], prefer_mapped=True)
+        
+        self.assertTrue(mapper.has_mapping(old_root + "both.mkv"))
+        self.assertFalse(mapper.has_mapping("/elsewhere/both.mkv"))
+        self.assertEqual(mapper.get_file_info(old_root + "both.mkv"),
+                         (datetime.fromtimestamp(1100000000), new_root + "both.mkv", True))
+        self.assertEqual(mapper.get_file_info(old_root + "old_only.mkv"),
+                         (datetime.fromtimestamp(1200000000), old_root + "old_only.mkv", True))
+    
+    def test_get_file_info_not_exists(self):
+        """Test get_file_info when file doesn't exist."""
+        mtime, path, exists = self.mapper.get_file_info("/nonexistent/file.mkv")
+        
+        self.assertIsNone(mtime)
+        self.assertIsNone(path)
+        self.assertFalse(exists)
+    
+    def test_get_file_info_directory_is_not_file(self):
+        """Test that directories are not reported as media files."""
+        mtime, path, exists = self.mapper.get_file_info(self.temp_dir)
+        self.assertFalse(exists)
+    
+    def test_get_file_info_batch(self):
+        """Test batch lookups return results in input order."""
+        old_root = os.path.join(self.temp_dir, "old") + os.sep
+        new_root = os.path.join(self.temp_dir, "new") + os.sep
+        self._make_file(os.path.join(new_root, "a.mkv"), mtime=1000000000)
+        self._make_file(os.path.join(new_root, "b.mkv"), mtime=1100000000)
+        mapper = PlexPathMapper([(old_root, new_root)])
+        paths = [old_root + "b.mkv", "", old_root + "missing.mkv", old_root + "a.mkv"]
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = mapper.get_file_info_batch(paths, executor)
+        
+        self.assertEqual(results, [
+            (datetime.fromtimestamp(1100000000), new_root + "b.mkv", True),
+            (None, None, False),
+            (None, None, False),
+            (datetime.fromtimestamp(1000000000), new_root + "a.mkv", True),
+        ])
+        self.assertEqual(results, mapper.get_file_info_batch(paths))
+    
+    def test_get_file_info_batch_lists_fallbacks_lazily(self):
+        """Test batches only list fallback directories for files not found first."""
+        old_root = os.path.join(self.temp_dir, "old") + os.sep
+        new_root = os.path.join(self.temp_dir, "new") + os.sep
+        self._make_file(os.path.join(new_root, "a", "x.mkv"))
+        self._make_file(os.path.join(old_root, "b", "y.mkv"))
+        self._make_file(os.path.join(new_root, "b", "other.mkv"))
+        paths = [old_root + "a/x.mkv", old_root + "b/y.mkv"]
+        
+        for prefer_mapped, skipped in ((True, old_root + "a"), (False, new_root + "b")):
+            mapper = PlexPathMapper([(old_root, new_root)], prefer_mapped=prefer_mapped)
+            with patch('os.scandir', wraps=os.scandir) as mock_scandir:
+                results = mapper.get_file_info_batch(paths)
+            
+            self.assertEqual([exists for _, _, exists in results], [True, True])
+            listed = [args[0] for args, _ in mock_scandir.call_args_list]
+            self.assertNotIn(skipped, listed)
+            self.assertEqual(len(listed), len(set(listed)))
+    
+    def test_directory_cache_is_bounded(self):
+        """Test that the least recently used directory listings are evicted."""
+        with patch.object(plex_tool, '_DIR_CACHE_SIZE', 2):
+            for name in ("a", "b", "a", "c"):
+                self.mapper.file_exists(os.path.join(self.temp_dir, name, "file.mkv"))
+        
+        self.assertEqual(list(self.mapper._dir_cache),
+                         [os.path.join(self.temp_dir, "a"), os.path.join(self.temp_dir, "c")])
+    
+    def test_file_info_cache_is_bounded(self):
+        """Test the oldest file info results are dropped first."""
+        paths = [os.path.join(self.temp_dir, f"{name}.mkv") for name in ("a", "b", "c")]
+        with patch.object(plex_tool, '_STAT_CACHE_SIZE', 2):
+            for path in paths:
+                self.mapper.get_file_info(path)
+        
+        self.assertEqual(list(self.mapper._stat_cache), paths[1:])
+    
+    def test_file_info_is_cached(self):
+        """Test repeat lookups reuse the first result until the cache is cleared."""
+        file_path = os.path.join(self.temp_dir, "cached.mkv")
+        self._make_file(file_path, 1000000000)
+        first = self.mapper.get_file_info(file_path)
+        
+        os.remove(file_path)
+        self.assertEqual(self.mapper.get_file_info(file_path), first)
+        self.assertEqual(self.mapper.get_file_info_batch([file_path]), [first])
+        
+        self.mapper.clear_cache()
+        self.assertEqual(self.mapper.get_file_info(file_path), (None, None, False))
+    
+    def test_unreadable_directory_falls_back_to_stat(self):
+        """Test files stay visible when their directory cannot be listed."""
+        file_path = os.path.join(self.temp_dir, "locked", "file.mkv")
+        self._make_file(file_path, 1000000000)
+        
+        with patch('os.scandir', side_effect=PermissionError("search only")):
+            self.assertEqual(self.mapper.get_file_info(file_path),
+                             (datetime.fromtimestamp(1000000000), file_path, True))
+            self.assertFalse(self.mapper.file_exists(os.path.join(self.temp_dir, "locked", "other.mkv")))
+            self.assertFalse(self.mapper.file_exists(os.path.dirname(file_path)))
+    
+    def test_folded_name_falls_back_to_stat(self):
+        """Test names differing only in case or Unicode form are checked with os.stat."""
+        folder = os.path.join(self.temp_dir, "films")
+        disk_name = unicodedata.normalize('NFD', "Amélie.mkv")
+        self._make_file(os.path.join(folder, disk_name), 1000000000)
+        real_stat = os.stat
+        
+        def insensitive_stat(path):
+            # Emulate a case- and normalization-insensitive filesystem
+            name = unicodedata.normalize('NFC', os.path.basename(path)).casefold()
+            for candidate in os.listdir(os.path.dirname(path)):
+                if unicodedata.normalize('NFC', candidate).casefold() == name:
+                    return real_stat(os.path.join(os.path.dirname(path), candidate))
+            raise FileNotFoundError(path)
+        
+        with patch('os.stat', side_effect=insensitive_stat) as mock_stat:
+            for db_name in ("Amélie.mkv", "AMÉLIE.mkv"):
+                db_path = os.path.join(folder, unicodedata.normalize('NFC', db_name))
+                self.assertEqual(self.mapper.get_file_info(db_path),
+                                 (datetime.fromtimestamp(1000000000), db_path, True))
+            stat_calls = mock_stat.call_count
+            self.assertFalse(self.mapper.file_exists(os.path.join(folder, "Brazil.mkv")))
+            self.assertEqual(mock_stat.call_count, stat_calls)
+    
+    def test_clear_cache(self):
+        """Test that directory listings are cached until cleared."""
+        file_path = os.path.join(self.temp_dir, "late.mkv")
+        self.assertFalse(self.mapper.file_exists(file_path))
+        
+        self._make_file(file_path)
+        self.assertFalse(self.mapper.file_exists(file_path))
+        
+        self.mapper.clear_cache()
+        self.assertTrue(self.mapper.file_exists(file_path))
+
+
+class TestCSVHandler(unittest.TestCase):
+    """Test cases for CSVHandler class."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, "test.csv")
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def _create_export_database(self, db_path):
+        """Create a database with the columns read by the CSV export."""
+        metadata_columns = [
+            'metadata_type', 'media_item_count', 'title', 'title_sort', 'original_title',
+            'studio', 'rating', 'rating_count', 'tagline', 'summary', 'content_rating',
+            'duration', 'user_thumb_url', 'user_art_url', 'user_banner_url', 'user_music_url',
+            'tags_genre', 'tags_director', 'tags_writer', 'tags_star',
+            'originally_available_at', 'available_at', 'added_at', 'created_at',
+            'updated_at', 'library_section_id', 'parent_id', 'hash'
+        ]
+        conn = sqlite3.connect(db_path)
+        conn.execute(f"CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, {', '.join(metadata_columns)})")
+        conn.execute("""
+            CREATE TABLE media_items (
+                id INTEGER PRIMARY KEY, metadata_item_id INTEGER, size INTEGER, width INTEGER,
+                height INTEGER, container TEXT, video_codec TEXT, audio_codec TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE media_parts (
+                id INTEGER PRIMARY KEY, media_item_id INTEGER, file TEXT, size INTEGER,
+                duration INTEGER, created_at INTEGER, updated_at INTEGER
+            )
+        """)
+        for item_id, title, file_path in [
+            (1, 'Found Movie', '/old/movies/found.mkv'),
+            (2, 'Missing Movie', '/old/movies/missing.mkv'),
+        ]:
+            conn.execute(
+                "INSERT INTO metadata_items (id, title, summary, updated_at, library_section_id) "
+                "VALUES (?, ?, ?, ?, 1)",
+                (item_id, title, 'Line one,\nline two', 1000000000 + item_id)
+            )
+            conn.execute("INSERT INTO media_items (id, metadata_item_id) VALUES (?, ?)", (item_id, item_id))
+            conn.execute("INSERT INTO media_parts (id, media_item_id, file) VALUES (?, ?, ?)",
+                         (item_id, item_id, file_path))
+        conn.commit()
+        conn.close()
+    
+    def test_export_full_media_data_to_csv(self):
+        """Test exporting media data with file times to CSV."""
+        db_path = os.path.join(self.temp_dir, "export.db")
+        self._create_export_database(db_path)
+        
+        new_root = os.path.join(self.temp_dir, "new") + os.sep
+        os.makedirs(os.path.join(new_root, "movies"))
+        found_path = os.path.join(new_root, "movies", "found.mkv")
+        with open(found_path, "w"):
+            pass
+        os.utime(found_path, (1234567890, 1234567890))
+        mapper = PlexPathMapper([("/old/", new_root)])
+        
+        self.assertTrue(CSVHandler.export_full_media_data_to_csv(db_path, self.csv_path, mapper))
+        
+        with open(self.csv_path, newline='', encoding='utf-8') as f:
+            rows = {row['id']: row for row in csv.DictReader(f)}
+        
+        self.assertEqual(rows['1']['file_exists'], 'true')
+        self.assertEqual(rows['1']['actual_file_path'], found_path)
+        self.assertEqual(rows['1']['path_was_mapped'], 'true')
+        self.assertEqual(rows['1']['new_updated_at'], '1234567890')
+        self.assertEqual(rows['1']['summary'], 'Line one,\nline two')
+        self.assertEqual(rows['2']['file_exists'], 'false')
+        self.assertEqual(rows['2']['new_updated_at'], rows['2']['updated_at'])
+    
+    def test_iter_probed_batches_keeps_order(self):
+        """Test batches are probed ahead but yielded in fetch order."""
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (id INTEGER, file TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"/nonexistent/{i}.mkv") for i in range(5)])
+        mapper = PlexPathMapper([("/nonexistent/", "/missing/")])
+        
+        for workers in (1, 4):
+            cursor = conn.execute("SELECT id, file FROM t ORDER BY id")
+            cursor.arraysize = 2
+            with stat_executor(workers) as executor:
+                batches = list(CSVHandler._iter_probed_batches(cursor, mapper, executor, 1))
+            
+            self.assertEqual([[row[0] for row in rows] for rows, _ in batches], [[0, 1], [2, 3], [4]])
+            self.assertEqual([len(infos) for _, infos in batches], [2, 2, 1])
+        conn.close()
+    
+    def test_export_and_import_gzip_csv(self):
+        """Test a gzip-compressed CSV round trip from export to new database."""
+        db_path = os.path.join(self.temp_dir, "export.db")
+        self._create_export_database(db_path)
+        found_path = os.path.join(self.temp_dir, "movies", "found.mkv")
+        os.makedirs(os.path.dirname(found_path))
+        with open(found_path, "w"):
+            pass
+        os.utime(found_path, (1234567890, 1234567890))
+        mapper = PlexPathMapper([("/old/", self.temp_dir + os.sep)])
+        gz_path = self.csv_path + ".gz"
+        output_db = os.path.join(self.temp_dir, "output.db")
+        
+        self.assertTrue(CSVHandler.export_full_media_data_to_csv(db_path, gz_path, mapper))
+        with open(gz_path, 'rb') as f:
+            self.assertEqual(f.read(2), b'\x1f\x8b')
+        self.assertTrue(CSVHandler.create_db_from_csv(gz_path, db_path, output_db))
+        
+        conn = sqlite3.connect(output_db)
+        updated_at = conn.execute("SELECT updated_at FROM metadata_items WHERE id = 1").fetchone()[0]
+        conn.close()
+        self.assertEqual(updated_at, 1234567890)
+    
+    def test_read_columns_ragged_rows(self):
+        """Test short rows read missing fields as None and extra fields are ignored."""
+        csvfile = io.StringIO(
+            "id,file_exists,updated_at,new_updated_at\n"
+            "1,true,5,6\n"
+            "2,true\n"
+            "\n"
+            "3,false,5,5,extra,fields\n"
+        )
+        rows = CSVHandler._read_columns(csvfile, [
+            ('id', None), ('new_updated_at', None), ('library_section_id', 'Unknown')
+        ])
+        
+        self.assertEqual(list(rows), [
+            ('1', '6', 'Unknown'),
+            ('2', None, 'Unknown'),
+            ('3', '5', 'Unknown'),
+        ])
+    
+    def test_analyze_csv(self):
+        """Test CSV analysis functionality."""
+        # Create test CSV
+        with open(self.csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[
+                'id', 'title', 'file_exists', 'path_was_mapped', 
+                'updated_at', 'new_updated_at', 'library_section_id'
+            ])
+            writer.writeheader()
+            writer.writerow({
+                'id': '1', 'title': 'Test Movie',
+                'file_exists': 'true', 'path_was_mapped': 'true',
+                'updated_at': '1234567890', 'new_updated_at': '1234567891',
+                'library_section_id': '1'
+            })
+            writer.writerow({
+                'id': '2', 'title': 'Test Movie 2',
+                'file_exists': 'false', 'path_was_mapped': 'false',
+                'updated_at': '1234567890', 'new_updated_at': '1234567890',
+                'library_section_id': '1'
+            })
+        
+        # Capture output
+        with patch('builtins.print') as mock_print:
+            CSVHandler.analyze_csv(self.csv_path)
+            
+        # Verify analysis was performed
+        calls = [str(call) for call in mock_print.call_args_list]
+        self.assertTrue(any("Total records: 2" in call for call in calls))
+        self.assertTrue(any("Files found: 1" in call for call in calls))
+        self.assertTrue(any("Paths mapped: 1" in call for call in calls))
+        self.assertTrue(any("Updates pending: 1" in call for call in calls))
+        self.assertTrue(any("Library 1: 2 records" in call for call in calls))
+    
+    def test_create_db_from_csv_applies_updates(self):
+        """Test creating database from CSV applies valid timestamps only."""
+        with open(self.csv_path, 'w') as f:
+            f.write("id,file_exists,updated_at,new_updated_at\n")
+            f.write("1,true,1000000000,1234567890\n")
+            f.write("2,true,1000000000,4102444800\n")  # 2100, rejected as invalid
+            f.write("3,false,1000000000,1234567890\n")
+            f.write("4,true,1234567890,1234567890\n")  # unchanged, not rewritten
+        
+        template_db = os.path.join(self.temp_dir, "template.db")
+        output_db = os.path.join(self.temp_dir, "output.db")
+        conn = sqlite3.connect(template_db)
+        conn.execute("CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, updated_at INTEGER)")
+        conn.executemany("INSERT INTO metadata_items VALUES (?, 1000000000)", [(1,), (2,), (3,), (4,)])
+        conn.commit()
+        conn.close()
+        
+        with self.assertLogs(logger, level='INFO') as logs:
+            self.assertTrue(CSVHandler.create_db_from_csv(self.csv_path, template_db, output_db))
+        
+        conn = sqlite3.connect(output_db)
+        rows = dict(conn.execute("SELECT id, updated_at FROM metadata_items"))
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        self.assertEqual(rows, {1: 1234567890, 2: 1000000000, 3: 1000000000, 4: 1000000000})
+        self.assertEqual(journal_mode, 'delete')
+        self.assertTrue(any("Skipping 1 items whose timestamp is unchanged" in line for line in logs.output))
+        self.assertTrue(any("Successfully updated 1 entries" in line for line in logs.output))
+    
+    def test_create_db_from_csv_rolls_back_on_error(self):
+        """Test a failing batch leaves the output database untouched."""
+        with open(self.csv_path, 'w') as f:
+            f.write("id,file_exists,updated_at,new_updated_at\n")
+            f.write("1,true,1000000000,1234567890\n")
+            f.write("2,true,1000000000,1234567890\n")
+        
+        template_db = os.path.join(self.temp_dir, "template.db")
+        output_db = os.path.join(self.temp_dir, "output.db")
+        conn = sqlite3.connect(template_db)
+        conn.execute("CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, updated_at INTEGER)")
+        conn.executemany("INSERT INTO metadata_items VALUES (?, 1000000000)", [(1,), (2,)])
+        conn.execute(
+            "CREATE TRIGGER reject_update BEFORE UPDATE ON metadata_items "
+            "WHEN NEW.id = 2 BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+        conn.commit()
+        conn.close()
+        
+        self.assertFalse(CSVHandler.create_db_from_csv(self.csv_path, template_db, output_db))
+        
+        conn = sqlite3.connect(output_db)
+        rows = dict(conn.execute("SELECT id, updated_at FROM metadata_items"))
+        conn.close()
+        self.assertEqual(rows, {1: 1000000000, 2: 1000000000})
+    
+    def test_create_db_from_csv_no_updates(self):
+        """Test creating database from CSV with no valid updates."""
+        # Create empty CSV
+        with open(self.csv_path, 'w') as f:
+            f.write("id,file_exists,new_updated_at\n")
+        
+        # Create dummy template db
+        template_db = os.path.join(self.temp_dir, "template.db")
+        output_db = os.path.join(self.temp_dir, "output.db")
+        
+        # Create minimal template database
+        conn = sqlite3.connect(template_db)
+        conn.execute("CREATE TABLE metadata_items (id INTEGER PRIMARY KEY, updated_at INTEGER)")
+        conn.close()
+        
+        result = CSVHandler.create_db_from_csv(self.csv_path, template_db, output_db)
+        
+        self.assertFalse(result)
+
+
+class TestPlexDatabaseManager(unittest.TestCase):
+    """Test cases for PlexDatabaseManager class."""
+    
+    def setUp(self):
+        # Create temporary database
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "test.db")
+        self._create_test_database()
+        
+        self.mapper = PlexPathMapper()
+        self.db_manager = PlexDatabaseManager(self.db_path, self.mapper)
+    
+    def tearDown(self):
+        self.db_manager.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def _create_test_database(self):
+        """Create a minimal test database."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # Create minimal schema
+        cursor.execute("""
+            CREATE TABLE metadata_items (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                added_at INTEGER,
+                created_at INTEGER,
+                updated_at INTEGER,
+                library_section_id INTEGER
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE media_items (
+                id INTEGER PRIMARY KEY,
+                metadata_item_id INTEGER
+            )
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE media_parts (
+                id INTEGER PRIMARY KEY,
+                media_item_id INTEGER,
+                file TEXT
+            )
+        """)
+        
+        # Insert test data
+        cursor.execute(
+            "INSERT INTO metadata_items VALUES (1, 'Test Movie', 1234567890, 1234567890, 1234567890, 1)"
+        )
+        cursor.execute("INSERT INTO media_items VALUES (1, 1)")
+        cursor.execute("INSERT INTO media_parts VALUES (1, 1, '/unittest/movies/test.mkv')")
+        
+        conn.commit()
+        conn.close()
+    
+    def test_get_connection(self):
+        """Test database connection context manager."""
+        with self.db_manager.get_connection() as conn:
+            self.assertIsNotNone(conn)
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM metadata_items")
+            count = cursor.fetchone()[0]
+            self.assertEqual(count, 1)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM metadata_items")
+    
+    def test_connection_is_reused(self):
+        """Test that the manager keeps one connection until closed."""
+        with self.db_manager.get_connection() as first, self.db_manager.get_connection() as second:
+            self.assertIs(first, second)
+        
+        with PlexDatabaseManager(self.db_path, self.mapper) as manager:
+            with manager.get_connection() as conn:
+                conn.execute("SELECT 1")
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    
+    def test_read_connection_is_read_only(self):
+        """Test the read connection opens awkward paths read-only at the file level."""
+        odd_path = os.path.join(self.temp_dir, "Plex Media #1?.db")
+        shutil.copy(self.db_path, odd_path)
+        conn = open_read_connection(odd_path)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM metadata_items").fetchone()[0], 1)
+            conn.execute("PRAGMA query_only = OFF")
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM metadata_items")
+        finally:
+            conn.close()
+    
+    def test_database_not_found(self):
+        """Test initialization with non-existent database."""
+        with self.assertRaises(FileNotFoundError):
+            PlexDatabaseManager("/nonexistent/path.db", self.mapper)
+    
+    @patch.object(PlexPathMapper, 'get_file_info')
+    def test_get_recent_media(self, mock_get_file_info):
+        """Test getting recent media entries."""
+        mock_get_file_info.return_value = (
+            datetime.fromtimestamp(1234567890),
+            "/home/unittest/movies/test.mkv",
+            True
+        )
+        
+        entries, updates, entries_by_id = self.db_manager.get_recent_media(limit=10)
+        
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['title'], 'Test Movie')
+        self.assertTrue(entries[0]['file_exists'])
+        self.assertTrue(entries[0]['path_mapped'])
+        self.assertEqual(updates, [(1234567890, 1)])
+        self.assertIs(entries_by_id[1], entries[0])
+        self.assertEqual(self.db_manager.get_recent_media(limit=10, stat_workers=1),
+                         (entries, updates, entries_by_id))
+    
+    @patch.object(PlexPathMapper, 'get_file_info')
+    def test_get_recent_media_sorted_in_sql(self, mock_get_file_info):
+        """Test sorting by a database timestamp limits the query itself."""
+        mock_get_file_info.return_value = (None, None, False)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT INTO metadata_items VALUES (2, 'Newer Movie', 1300000000, 1234567890, 1234567890, 1)"
+        )
+        conn.execute("INSERT INTO media_items VALUES (2, 2)")
+        conn.execute("INSERT INTO media_parts VALUES (2, 2, '/unittest/movies/newer.mkv')")
+        conn.commit()
+        conn.close()
+        
+        entries, updates, entries_by_id = self.db_manager.get_recent_media(limit=1, sort_by='added_at')
+        
+        self.assertEqual([e['title'] for e in entries], ['Newer Movie'])
+        self.assertEqual(list(entries_by_id), [2])
+        self.assertEqual(mock_get_file_info.call_count, 1)
+    
+    @patch.object(PlexPathMapper, 'get_file_info')
+    def test_get_recent_media_null_sort_keys(self, mock_get_file_info):
+        """Test items without the sort key come last, newest updated_at first."""
+        mock_get_file_info.return_value = (None, None, False)
+        conn = sqlite3.connect(self.db_path)
+        for item_id, added_at, updated_at in ((2, None, 1100000000), (3, 0, 1300000000), (4, None, 1200000000)):
+            conn.execute("INSERT INTO metadata_items VALUES (?, ?, ?, 1, ?, 1)",
+                         (item_id, f"Movie {item_id}", added_at, updated_at))
+            conn.execute("INSERT INTO media_items VALUES (?, ?)", (item_id, item_id))
+            conn.execute("INSERT INTO media_parts VALUES (?, ?, ?)", (item_id, item_id, f"/unittest/{item_id}.mkv"))
+        conn.commit()
+        conn.close()
+        
+        entries, _, _ = self.db_manager.get_recent_media(limit=3, sort_by='added_at')
+        
+        self.assertEqual([e['item_id'] for e in entries], [1, 3, 4])
+    
+    def test_sort_entries(self):
+        """Test entry sorting functionality."""
+        entries = [
+            {'file_mtime': datetime(2023, 1, 1), 'title': 'A'},
+            {'file_mtime': datetime(2023, 1, 3), 'title': 'B'},
+            {'file_mtime': datetime(2023, 1, 2), 'title': 'C'},
+        ]
+        
+        sorted_entries = self.db_manager._sort_entries(entries, 'file_mtime')
+        
+        self.assertEqual(sorted_entries[0]['title'], 'B')
+        self.assertEqual(sorted_entries[1]['title'], 'C')
+        self.assertEqual(sorted_entries[2]['title'], 'A')
+    
+    def test_sort_entries_with_limit(self):
+        """Test top-N selection matches a full sort, missing values last."""
+        entries = [
+            {'file_mtime': datetime(2023, 1, 2), 'title': 'A'},
+            {'file_mtime': None, 'title': 'B'},
+            {'file_mtime': datetime(2023, 1, 3), 'title': 'C'},
+            {'file_mtime': datetime(2023, 1, 2), 'title': 'D'},
+        ]
+        
+        top = self.db_manager._sort_entries(entries, 'file_mtime', limit=3)
+        
+        self.assertEqual([e['title'] for e in top], ['C', 'A', 'D'])
+        self.assertEqual(self.db_manager._sort_entries(entries, 'file_mtime', limit=10)[-1]['title'], 'B')
+    
+    def test_sort_entries_by_database_timestamp(self):
+        """Test entries sort on their raw Plex timestamps, unset values last."""
+        entries = [
+            self.db_manager._create_entry(i, title, added_at, None, None, 1, "/test/file.mkv")
+            for i, (title, added_at) in enumerate([('A', 1200000000), ('B', 0), ('C', 1300000000)])
+        ]
+        
+        self.assertEqual([e['title'] for e in self.db_manager._sort_entries(entries, 'added_at')],
+                         ['C', 'A', 'B'])
+    
+    def test_create_entry(self):
+        """Test entry creation keeps Plex timestamps as Unix seconds."""
+        entry = self.db_manager._create_entry(
+            1, "Test", 1234567890, 1234567891, 1234567892, 1, "/test/file.mkv"
+        )
+        
+        self.assertEqual(entry['item_id'], 1)
+        self.assertEqual(entry['title'], "Test")
+        self.assertEqual(entry['added_at'], 1234567890)
+        self.assertEqual(entry['created_at'], 1234567891)
+        self.assertEqual(entry['updated_at'], 1234567892)
+    
+    def test_create_entry_missing_timestamps(self):
+        """Test entry creation leaves missing or zero timestamps unset."""
+        entry = self.db_manager._create_entry(1, "Test", None, 0, "bad", 1, "/test/file.mkv")
+        
+        self.assertIsNone(entry['added_at'])
+        self.assertIsNone(entry['created_at'])
+        self.assertIsNone(entry['updated_at'])
+
+    def test_update_database_copy(self):
+        """Test writing a database copy skips invalid timestamps."""
+        output_db = os.path.join(self.temp_dir, "fixed.db")
+        
+        result = self.db_manager.update_database_copy(
+            [(1300000000, 1), (4102444800, 1)], output_db
+        )
+        
+        self.assertTrue(result)
+        conn = sqlite3.connect(output_db)
+        updated_at = conn.execute("SELECT updated_at FROM metadata_items WHERE id = 1").fetchone()[0]
+        conn.close()
+        self.assertEqual(updated_at, 1300000000)
+    
+    def test_update_database_copy_rolls_back_on_error(self):
+        """Test a failing update leaves the copy untouched instead of half-applied."""
+        output_db = os.path.join(self.temp_dir, "fixed.db")
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TRIGGER reject_update BEFORE UPDATE ON metadata_items "
+            "WHEN NEW.id = 2 BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+        conn.execute("INSERT INTO metadata_items (id, title, updated_at) VALUES (2, 'Other', 1)")
+        conn.commit()
+        conn.close()
+        
+        result = self.db_manager.update_database_copy([(1300000000, 1), (1300000000, 2)], output_db)
+        
+        self.assertFalse(result)
+        conn = sqlite3.connect(output_db)
+        updated_at = conn.execute("SELECT updated_at FROM metadata_items WHERE id = 1").fetchone()[0]
+        conn.close()
+        self.assertNotEqual(updated_at, 1300000000)
+    
+    def test_update_database_copy_plex_sqlite_fallback(self):
+        """Test Plex SQLite is run without a shell and failures fall back to a file copy."""
+        output_db = os.path.join(self.temp_dir, "fixed copy.db")
+        failed = Mock(returncode=1, stderr="unsupported")
+        
+        with patch.object(plex_tool, 'find_plex_sqlite', return_value="/opt/Plex SQLite"), \
+                patch('subprocess.run', return_value=failed) as mock_run:
+            result = self.db_manager.update_database_copy([(1300000000, 1)], output_db)
+        
+        self.assertTrue(result)
+        args, kwargs = mock_run.call_args
+        self.assertEqual(args[0], ["/opt/Plex SQLite", self.db_path, f'.backup "{output_db}"'])
+        self.assertFalse(kwargs.get('shell', False))
+    
+    def test_quote_dot_command_arg(self):
+        """Test dot-command arguments escape quotes and backslashes."""
+        self.assertEqual(quote_dot_command_arg("/tmp/it's.db"), '"/tmp/it\'s.db"')
+        self.assertEqual(quote_dot_command_arg('a"b\\c'), '"a\\"b\\\\c"')
+    
+    @unittest.skipUnless(shutil.which("sqlite3"), "sqlite3 shell not installed")
+    def test_update_database_copy_backup_path_with_quotes(self):
+        """Test the .backup command handles output paths containing quotes."""
+        output_db = os.path.join(self.temp_dir, "it's \"fixed\".db")
+        
+        with patch.object(plex_tool, 'find_plex_sqlite', return_value=shutil.which("sqlite3")), \
+                patch.object(plex_tool, 'copy2') as mock_copy:
+            result = self.db_manager.update_database_copy([(1300000000, 1)], output_db)
+        
+        self.assertTrue(result)
+        mock_copy.assert_not_called()
+        conn = sqlite3.connect(output_db)
+        updated_at = conn.execute("SELECT updated_at FROM metadata_items WHERE id = 1").fetchone()[0]
+        conn.close()
+        self.assertEqual(updated_at, 1300000000)
+    
+    def test_analyze_path_mappings_limit(self):
+        """Test analyze_path_mappings with limit=0 and nonzero."""
+        # Insert a second file for nonzero test
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO media_parts VALUES (?, ?, ?)", (2, 1, '/unittest/movies/another.mkv'))
+        conn.commit()
+        conn.close()
+
+        # Test with limit=1 (should return 1 path)
+        results = self.db_manager.analyze_path_mappings(limit=1)
+        self.assertEqual(results['total'], 1)
+        # Test with limit=0 (should return all paths, i.e., 2)
+        results = self.db_manager.analyze_path_mappings(limit=0)
+        self.assertEqual(results['total'], 2)
+
+    
+    def test_analyze_path_mappings_counts(self):
+        """Test each path is tallied under the location where its file was found."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO media_parts VALUES (?, ?, ?)", (2, 1, '/unittest/movies/missing.mkv'))
+        conn.commit()
+        conn.close()
+        os.makedirs(os.path.join(self.temp_dir, "movies"))
+        with open(os.path.join(self.temp_dir, "movies", "test.mkv"), "w"):
+            pass
+        
+        mapper = PlexPathMapper([("/unittest/", self.temp_dir + os.sep)])
+        with PlexDatabaseManager(self.db_path, mapper) as manager:
+            results = manager.analyze_path_mappings(limit=0)
+        
+        self.assertEqual(results['original_exists'], 0)
+        self.assertEqual(results['mapped_exists'], 1)
+        self.assertEqual(results['still_missing'], 1)
+        self.assertEqual(results['total'], 2)
+        self.assertEqual(results['success_rate'], 50.0)
+    
+    def test_get_recent_media_lists_each_directory_once(self):
+        """Test probing in batches keeps listings cached until they are used."""
+        conn = sqlite3.connect(self.db_path)
+        for i in range(2, 8):
+            conn.execute("INSERT INTO metadata_items VALUES (?, ?, 1, 1, 1, 1)", (i, f"Movie {i}"))
+            conn.execute("INSERT INTO media_items VALUES (?, ?)", (i, i))
+            conn.execute("INSERT INTO media_parts VALUES (?, ?, ?)", (i, i, f"/unittest/dir{i}/f.mkv"))
+            os.makedirs(os.path.join(self.temp_dir, f"dir{i}"))
+            with open(os.path.join(self.temp_dir, f"dir{i}", "f.mkv"), "w"):
+                pass
+        conn.commit()
+        conn.close()
+        
+        mapper = PlexPathMapper([("/unittest/", self.temp_dir + os.sep)])
+        with PlexDatabaseManager(self.db_path, mapper) as manager, \
+                patch.object(plex_tool, '_PROBE_BATCH_SIZE', 2), \
+                patch.object(plex_tool, '_DIR_CACHE_SIZE', 4), \
+                patch('os.scandir', wraps=os.scandir) as mock_scandir:
+            entries, updates, _ = manager.get_recent_media(limit=10, stat_workers=1)
+        
+        self.assertEqual(len(updates), 6)
+        listed = [args[0] for args, _ in mock_scandir.call_args_list]
+        self.assertEqual(len(listed), len(set(listed)))
+
+
+class TestResultDisplay(unittest.TestCase):
+    """Test cases for ResultDisplay class."""
+    
+    @patch('builtins.print')
+    def test_display_entries_empty(self, mock_print):
+        """Test displaying empty entries."""
+        ResultDisplay.display_entries([])
+        mock_print.assert_called_with("No entries found.")
+    
+    @patch('builtins.print')
+    def test_display_entries_with_data(self, mock_print):
+        """Test displaying entries with data."""
+        entries = [{
+            'title': 'Test Movie',
+            'library_section_id': 1,
+            'file_mtime': datetime(2023, 1, 1, 12, 0, 0),
+            'path_mapped': True,
+            'file_exists': True,
+            'actual_path': '/home/unittest/movies/test.mkv'
+        }]
+        
+        ResultDisplay.display_entries(entries)
+        
+        # Check that header was printed
+        calls = [str(call) for call in mock_print.call_args_list]
+        self.assertTrue(any("Top 1 Media Items" in call for call in calls))
+    
+    @patch('builtins.print')
+    def test_display_entries_with_invalid_timestamp(self, mock_print):
+        """Test displaying entries with invalid timestamps."""
+        entries = [{
+            'title': 'Future Movie',
+            'library_section_id': 1,
+            'file_mtime': datetime(2050, 1, 1),  # Future date
+            'path_mapped': False,
+            'file_exists': True,
+            'actual_path': '/test/movie.mkv'
+        }]
+        
+        ResultDisplay.display_entries(entries)
+        
+        # Check that warning was printed
+        calls = [str(call) for call in mock_print.call_args_list]
+        self.assertTrue(any("Found 1 files with invalid timestamps" in call for call in calls))
+        self.assertTrue(any("2050-01-01 00:00:00 ⚠️" in call for call in calls))
+    
+    @patch('builtins.print')
+    def test_display_entries_reads_clock_once(self, mock_print):
+        """Test the year bound is computed once per call, not per row."""
+        entries = [{'title': f'Movie {i}', 'library_section_id': 1, 'file_mtime': datetime(2023, 1, 1),
+                    'path_mapped': False, 'file_exists': True, 'actual_path': f'/m/{i}.mkv'}
+                   for i in range(5)]
+        
+        with patch.object(plex_tool, 'datetime', wraps=datetime) as mock_datetime:
+            ResultDisplay.display_entries(entries)
+        
+        self.assertEqual(mock_datetime.now.call_count, 1)
+    
+    @patch('builtins.print')
+    def test_display_entries_rows(self, mock_print):
+        """Test each entry is formatted as one table row."""
+        entries = [
+            {'title': 'First', 'library_section_id': 1, 'file_mtime': datetime(2023, 1, 1),
+             'path_mapped': True, 'file_exists': True, 'actual_path': '/movies/first.mkv'},
+            {'title': 'Second', 'library_section_id': 2, 'file_mtime': None,
+             'path_mapped': False, 'file_exists': False, 'plex_path': '/movies/second.mkv'},
+            {'title': 'Third', 'library_section_id': 3, 'file_mtime': None,
+             'path_mapped': False, 'file_exists': False, 'actual_path': '/tv/a-very-long-episode-file-name.mkv'},
+        ]
+        
+        ResultDisplay.display_entries(entries)
+        
+        rows = mock_print.call_args_list[-1][0][0].split("\n")
+        self.assertEqual(rows, [
+            f"{'First':<30} {'1':<3} {'2023-01-01 00:00:00':<20} {'Yes':<6} {'Found':<8} {'first.mkv':<25}",
+            f"{'Second':<30} {'2':<3} {'N/A':<20} {'No':<6} {'Missing':<8} {'second.mkv':<25}",
+            f"{'Third':<30} {'3':<3} {'N/A':<20} {'No':<6} {'Missing':<8} {'a-very-long-episode-file':<25}",
+        ])
+
+
+class TestIntegration(unittest.TestCase):
+    """Integration tests for the complete tool."""
+    
+    def setUp(self):
+        # Create a temporary test database
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_db = os.path.join(self.temp_dir, "test.db")
+        self._create_minimal_db()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def _create_minimal_db(self):
+        """Create a minimal test database."""
+        conn = sqlite3.connect(self.test_db)
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE media_parts (file TEXT)")
+        cursor.execute("INSERT INTO media_parts VALUES ('/test/file.mkv')")
+        conn.commit()
+        conn.close()
+    
+    @patch('sys.argv', ['plex_mapper.py', '--analyze', '--limit', '5'])
+    def test_main_analyze_mode(self):
+        """Test main function in analyze mode."""
+        # Patch sys.argv to include our test database
+        with patch('sys.argv', ['plex_mapper.py', '--analyze', '--limit', '5', '--db', self.test_db]):
+            with patch('pathlib.Path.exists', return_value=True):
+                result = main()
+        
+        self.assertEqual(result, 0)
+    
+    @patch('sys.argv', ['plex_mapper.py', '--db', '/nonexistent/db.db'])
+    def test_main_database_not_found(self):
+        """Test main function with non-existent database."""
+        result = main()
+        self.assertEqual(result, 1)
+    
+    def test_main_without_path_mappings(self):
+        """Test a missing mapping config is reported instead of raising."""
+        for mode in (['--analyze'], [], ['--export-csv', os.path.join(self.temp_dir, "out.csv")]):
+            with patch('sys.argv', ['plex_mapper.py', '--db', self.test_db] + mode), \
+                    patch.object(PlexPathMapper, '_load_mappings_from_file', return_value=[]), \
+                    self.assertLogs(logger, level='ERROR') as logs:
+                self.assertEqual(main(), 1)
+            self.assertIn("No path mappings found", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)